@@ -24,6 +24,10 @@ def clear_connection_state():
     st.session_state.cache_lookup_values = {}
     st.session_state.cache_lookup_fields = {}
     
+    # Drop frames, exports and indexes derived from the old results and metadata
+    for key in ('query_results_df', 'results_date_columns', 'prepared_export', 'rets_tables', 'field_index'):
+        st.session_state.pop(key, None)
+    
     # Clear TTL cache
     if 'ttl_cache' in st.session_state:
         st.session_state.ttl_cache.clear()
@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from clients.rets_client import RESOWebAPIClient
 from history import render_reso_query_history, render_rets_query_history
 from smart_suggestions import render_intelligent_query_generator
+from utils import get_results_df, estimate_memory_usage
 
 # Cache helper functions (import from app_new.py)
 def get_cached_resources():
@@ -372,7 +372,7 @@ def render_query_results():
         st.markdown("---")
         st.subheader("📊 Query Results")
         
-        results_df = pd.DataFrame(st.session_state.query_results)
+        results_df = get_results_df()
         
         # Show results summary
         col1, col2, col3 = st.columns(3)
@@ -381,7 +381,7 @@ def render_query_results():
         with col2:
             st.metric("Total Columns", len(results_df.columns))
         with col3:
-            st.metric("Data Size", f"{results_df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+            st.metric("Data Size", f"{estimate_memory_usage(results_df) / 1024:.1f} KB")
         
         # Display the results table
         st.dataframe(results_df, use_container_width=True, height=400)
@@ -1,9 +1,40 @@
 import streamlit as st
+import pandas as pd
 import re
 from datetime import datetime, timedelta
 # import google.generativeai as genai  # Commented out - AI features disabled
 import json
 
+try:
+    # RE2 matches in linear time, which matters for long, untrusted LLM responses
+    import re2 as _linear_re
+except ImportError:
+    _linear_re = re
+
+# Query extraction patterns used when the AI response is not valid JSON
+_DMQL_QUERY_RE = _linear_re.compile(r'\([^)]+\)(?:,\([^)]+\))*')
+_ODATA_QUERY_RE = _linear_re.compile(r'[A-Za-z]+\s+(eq|ne|gt|ge|lt|le)\s+[\'"]?[^\'"]+[\'"]?(?:\s+and\s+[A-Za-z]+\s+(eq|ne|gt|ge|lt|le)\s+[\'"]?[^\'"]+[\'"]?)*')
+
+# Operator rewrites applied by _fix_rets_operators, in order
+_RETS_OPERATOR_FIXES = (
+    # Fix greater than operators: (Field>Value) -> (Field=Value+)
+    (re.compile(r'\(([^=]+)>([^)]+)\)'), r'(\1=\2+)'),
+    # Fix greater than or equal operators: (Field>=Value) -> (Field=Value+)
+    (re.compile(r'\(([^=]+)>=([^)]+)\)'), r'(\1=\2+)'),
+    # Fix less than operators: (Field<Value) -> (Field=-Value)
+    (re.compile(r'\(([^=]+)<([^)]+)\)'), r'(\1=-\2)'),
+    # Fix less than or equal operators: (Field<=Value) -> (Field=-Value)
+    (re.compile(r'\(([^=]+)<=([^)]+)\)'), r'(\1=-\2)'),
+    # Fix not equal operators: (Field!=Value) -> (Field!Value)
+    (re.compile(r'\(([^=]+)!=([^)]+)\)'), r'(\1!\2)'),
+    # Fix AND operators: (Field1=Value1) AND (Field2=Value2) -> (Field1=Value1),(Field2=Value2)
+    (re.compile(r'\)\s+AND\s+\('), r'),('),
+    # Fix OR operators: (Field1=Value1) OR (Field2=Value2) -> (Field1=Value1)|(Field2=Value2)
+    (re.compile(r'\)\s+OR\s+\('), r')|('),
+)
+# A query containing none of these substrings is left unchanged by every rewrite
+_RETS_OPERATOR_MARKERS = ('>', '<', '!=', 'AND', 'OR')
+
 # Configure Gemini API (commented out - AI features disabled)
 # def configure_gemini(api_key):
 #     """Configure the Gemini API with the provided key."""
@@ -14,6 +45,111 @@ import json
 #         st.error(f"Failed to configure Gemini API: {str(e)}")
 #         return False
 
+# AI prompt sections, built once at import and filled in by _create_ai_prompt
+_FMT_RESOURCE_LINE = "• {}: {} fields".format
+_FMT_CATEGORY_HEADER = "\n{} FIELDS ({} available):\n".format
+_FMT_CATEGORY_FIELD = "  - {}\n".format
+
+_PROMPT_HEADER = """
+You are an expert in {protocol} query generation. You have access to ALL {total_fields} fields from the metadata. 
+Analyze the user's request and find the EXACT field names that match their requirements.
+
+USER REQUEST: "{request}"
+
+METADATA SUMMARY:
+Protocol: {summary_protocol}
+Total Available Fields: {total_fields}
+Available Resources: {resource_count}
+
+RESOURCE DETAILS:
+{resource_details}
+
+COMPREHENSIVE FIELD CATEGORIES:
+"""
+
+_PROMPT_COMMON_PATTERNS = """
+COMMON FIELD PATTERNS:
+- Price Fields: {price_fields}
+- Status Fields: {status_fields}
+- Bedroom Fields: {bedroom_fields}
+- Bathroom Fields: {bathroom_fields}
+- Location Fields: {location_fields}
+- Date Fields: {date_fields}
+- Property Type Fields: {property_type_fields}
+
+LOOKUP VALUES FOR IMPORTANT FIELDS (use these exact values):
+
+
+ALL AVAILABLE FIELDS (search through these for exact matches):
+"""
+
+_PROMPT_INSTRUCTIONS = """
+
+CRITICAL INSTRUCTIONS:
+1. Search through ALL {total_fields} available fields above to find EXACT field names
+2. Do NOT use generic field names like "ListPrice" or "Status" unless they actually exist in the field list
+3. Match user terms to actual field names in the metadata
+4. If you can't find an exact match, look for similar field names or explain what's available
+5. Use the most specific field names available for the user's request
+6. **CRITICAL**: Use generic values like "Active", "Residential", "Sale" for now - the system will enhance the query with actual lookup values afterward
+7. Focus on finding the correct field names first, then use appropriate generic values
+8. The system will automatically fetch and show you the actual lookup values for the fields you use
+
+TASK:
+1. Analyze the user's request to understand what they're looking for
+2. Search through ALL available fields to find exact matches
+3. Generate a valid {protocol} query using ONLY field names that exist in the metadata
+4. Provide a clear explanation of what the query does
+
+QUERY FORMAT:
+"""
+
+_PROMPT_RETS_FORMAT = """- For RETS: Use DMQL format with these EXACT operators:
+  * Equals: (FieldName=Value)
+  * Greater than: (FieldName=Value+)  (use + after the value)
+  * Greater than or equal: (FieldName=Value+)  (use + after the value)
+  * Less than: (FieldName=-Value)  (use - before the value)
+  * Less than or equal: (FieldName=-Value)  (use - before the value)
+  * Range: (FieldName=MinValue-MaxValue)  (use - between values)
+  * Multiple conditions: (Field1=Value1),(Field2=Value2+)  (use commas for AND)
+  * Wildcard: (FieldName=*Value*)  (use * for LIKE)
+  
+  Examples:
+  - Active listings: (Status=Active)
+  - Price above $500k: (ListPrice=500000+)
+  - 3+ bedrooms: (BedroomsTotal=3+)
+  - Price range: (ListPrice=300000-800000)
+  - Multiple conditions: (Status=Active),(ListPrice=500000+),(BedroomsTotal=3+)"""
+
+_PROMPT_RESO_FORMAT = """- For RESO Web API: Use OData format like "FieldName eq 'Value' and FieldName2 gt 100"
+  * Equals: FieldName eq 'Value'
+  * Greater than: FieldName gt Value
+  * Greater than or equal: FieldName ge Value
+  * Less than: FieldName lt Value
+  * Less than or equal: FieldName le Value
+  * AND: FieldName1 eq 'Value1' and FieldName2 gt Value2
+  * OR: FieldName1 eq 'Value1' or FieldName2 eq 'Value2'"""
+
+_PROMPT_RESPONSE_FORMAT = """
+
+RESPONSE FORMAT (JSON):
+{
+    "query": "the generated query string using actual field names",
+    "explanation": "clear explanation of what the query does",
+    "field_mapping": {
+        "user_request_term": "actual_field_name_used"
+    },
+    "ai_analysis": {
+        "identified_requirements": ["list of requirements identified"],
+        "selected_fields": ["list of exact field names selected"],
+        "reasoning": "explanation of why these specific fields were chosen",
+        "field_search_results": "summary of field matching process"
+    }
+}
+
+Generate the query now, using ONLY field names that exist in the metadata above:
+"""
+
 def render_intelligent_query_generator(metadata, protocol="RETS"):
     """
     Render an intelligent query generator that uses Gemini AI to analyze metadata and generate queries
@@ -142,7 +278,9 @@ def _prepare_metadata_summary(metadata, protocol):
         'common_fields': {},
         'field_examples': [],
         'all_fields': [],
+        'all_fields_chunked': [],
         'field_statistics': {},
+        'field_categories_sorted': [],
         'lookup_values': {}
     }
     
@@ -201,9 +339,19 @@ def _prepare_metadata_summary(metadata, protocol):
                             summary['field_examples'].append(field_info)
                             summary['all_fields'].append(field_name)
     
+    # Pre-chunk the field list ten per line for the prompt's searchable field listing
+    all_fields = summary['all_fields']
+    summary['all_fields_chunked'] = [all_fields[i:i + 10] for i in range(0, len(all_fields), 10)]
+    
     # Generate comprehensive field statistics
     summary['field_statistics'] = _generate_field_statistics(summary['all_fields'])
     
+    # Non-empty field categories, largest first, so the prompt leads with the most useful ones
+    summary['field_categories_sorted'] = sorted(
+        ((category, fields) for category, fields in summary['field_statistics']['field_categories'].items() if fields),
+        key=lambda item: -len(item[1])
+    )
+    
     # Identify common field patterns from ALL fields
     summary['common_fields'] = _identify_common_field_patterns(summary['field_examples'])
     
@@ -644,132 +792,38 @@ def _create_ai_prompt(request, metadata_summary, protocol):
     # Prepare comprehensive field information
     total_fields = metadata_summary['field_statistics']['total_fields']
     
-    # Get all available fields for the AI to search through
-    all_fields_list = metadata_summary['all_fields']
-    
-    # Create field categories for better matching
-    field_categories = metadata_summary['field_statistics']['field_categories']
+    common_fields = metadata_summary['common_fields']
     
-    prompt = f"""
-You are an expert in {protocol} query generation. You have access to ALL {total_fields} fields from the metadata. 
-Analyze the user's request and find the EXACT field names that match their requirements.
-
-USER REQUEST: "{request}"
-
-METADATA SUMMARY:
-Protocol: {metadata_summary['protocol']}
-Total Available Fields: {total_fields}
-Available Resources: {len(metadata_summary['resources'])}
-
-RESOURCE DETAILS:
-{chr(10).join([f"• {r['name']}: {r['field_count']} fields" for r in metadata_summary['resources'][:10]])}
-
-COMPREHENSIVE FIELD CATEGORIES:
-"""
+    parts = [_PROMPT_HEADER.format(
+        protocol=protocol,
+        total_fields=total_fields,
+        request=request,
+        summary_protocol=metadata_summary['protocol'],
+        resource_count=len(metadata_summary['resources']),
+        resource_details=chr(10).join([_FMT_RESOURCE_LINE(r['name'], r['field_count']) for r in metadata_summary['resources'][:10]])
+    )]
     
-    # Add field categories with actual field names
-    for category, fields in field_categories.items():
-        if fields:
-            prompt += f"\n{category.upper()} FIELDS ({len(fields)} available):\n"
-            # Show all fields in this category, not just first 5
-            for field in fields:
-                prompt += f"  - {field}\n"
+    # Add field categories with actual field names (pre-filtered and sorted by size)
+    for category, fields in metadata_summary['field_categories_sorted']:
+        parts.append(_FMT_CATEGORY_HEADER(category.upper(), len(fields)))
+        # Show all fields in this category, not just first 5
+        parts.extend(map(_FMT_CATEGORY_FIELD, fields))
     
     # Add common field patterns
-    prompt += f"""
-COMMON FIELD PATTERNS:
-- Price Fields: {', '.join(metadata_summary['common_fields']['price_fields'][:10])}
-- Status Fields: {', '.join(metadata_summary['common_fields']['status_fields'][:10])}
-- Bedroom Fields: {', '.join(metadata_summary['common_fields']['bedroom_fields'][:10])}
-- Bathroom Fields: {', '.join(metadata_summary['common_fields']['bathroom_fields'][:10])}
-- Location Fields: {', '.join(metadata_summary['common_fields']['location_fields'][:10])}
-- Date Fields: {', '.join(metadata_summary['common_fields']['date_fields'][:10])}
-- Property Type Fields: {', '.join(metadata_summary['common_fields']['property_type_fields'][:10])}
-
-LOOKUP VALUES FOR IMPORTANT FIELDS (use these exact values):
-"""
+    parts.append(_PROMPT_COMMON_PATTERNS.format(
+        **{pattern: ', '.join(fields[:10]) for pattern, fields in common_fields.items()}
+    ))
     
-    prompt += f"""
-
-ALL AVAILABLE FIELDS (search through these for exact matches):
-"""
+    # Add all fields in a searchable format, ten per line
+    for chunk in metadata_summary['all_fields_chunked']:
+        parts.append(', '.join(chunk))
+        parts.append("\n" if len(chunk) == 10 else ", ")
     
-    # Add all fields in a searchable format
-    for i, field in enumerate(all_fields_list):
-        prompt += f"{field}"
-        if (i + 1) % 10 == 0:  # New line every 10 fields
-            prompt += "\n"
-        else:
-            prompt += ", "
+    parts.append(_PROMPT_INSTRUCTIONS.format(total_fields=total_fields, protocol=protocol))
+    parts.append(_PROMPT_RETS_FORMAT if protocol == "RETS" else _PROMPT_RESO_FORMAT)
+    parts.append(_PROMPT_RESPONSE_FORMAT)
     
-    prompt += f"""
-
-CRITICAL INSTRUCTIONS:
-1. Search through ALL {total_fields} available fields above to find EXACT field names
-2. Do NOT use generic field names like "ListPrice" or "Status" unless they actually exist in the field list
-3. Match user terms to actual field names in the metadata
-4. If you can't find an exact match, look for similar field names or explain what's available
-5. Use the most specific field names available for the user's request
-6. **CRITICAL**: Use generic values like "Active", "Residential", "Sale" for now - the system will enhance the query with actual lookup values afterward
-7. Focus on finding the correct field names first, then use appropriate generic values
-8. The system will automatically fetch and show you the actual lookup values for the fields you use
-
-TASK:
-1. Analyze the user's request to understand what they're looking for
-2. Search through ALL available fields to find exact matches
-3. Generate a valid {protocol} query using ONLY field names that exist in the metadata
-4. Provide a clear explanation of what the query does
-
-QUERY FORMAT:
-"""
-    
-    if protocol == "RETS":
-        prompt += """- For RETS: Use DMQL format with these EXACT operators:
-  * Equals: (FieldName=Value)
-  * Greater than: (FieldName=Value+)  (use + after the value)
-  * Greater than or equal: (FieldName=Value+)  (use + after the value)
-  * Less than: (FieldName=-Value)  (use - before the value)
-  * Less than or equal: (FieldName=-Value)  (use - before the value)
-  * Range: (FieldName=MinValue-MaxValue)  (use - between values)
-  * Multiple conditions: (Field1=Value1),(Field2=Value2+)  (use commas for AND)
-  * Wildcard: (FieldName=*Value*)  (use * for LIKE)
-  
-  Examples:
-  - Active listings: (Status=Active)
-  - Price above $500k: (ListPrice=500000+)
-  - 3+ bedrooms: (BedroomsTotal=3+)
-  - Price range: (ListPrice=300000-800000)
-  - Multiple conditions: (Status=Active),(ListPrice=500000+),(BedroomsTotal=3+)"""
-    else:
-        prompt += """- For RESO Web API: Use OData format like "FieldName eq 'Value' and FieldName2 gt 100"
-  * Equals: FieldName eq 'Value'
-  * Greater than: FieldName gt Value
-  * Greater than or equal: FieldName ge Value
-  * Less than: FieldName lt Value
-  * Less than or equal: FieldName le Value
-  * AND: FieldName1 eq 'Value1' and FieldName2 gt Value2
-  * OR: FieldName1 eq 'Value1' or FieldName2 eq 'Value2'"""
-    
-    prompt += f"""
-
-RESPONSE FORMAT (JSON):
-{{
-    "query": "the generated query string using actual field names",
-    "explanation": "clear explanation of what the query does",
-    "field_mapping": {{
-        "user_request_term": "actual_field_name_used"
-    }},
-    "ai_analysis": {{
-        "identified_requirements": ["list of requirements identified"],
-        "selected_fields": ["list of exact field names selected"],
-        "reasoning": "explanation of why these specific fields were chosen",
-        "field_search_results": "summary of field matching process"
-    }}
-}}
-
-Generate the query now, using ONLY field names that exist in the metadata above:
-"""
-    return prompt
+    return "".join(parts)
 
 def _parse_ai_response(response_text, request, protocol):
     """
@@ -807,28 +861,12 @@ def _fix_rets_operators(query):
     Fix common operator mistakes in RETS DMQL queries.
     Converts standard comparison operators to proper RETS syntax.
     """
-    import re
+    # Already valid DMQL (the common case) has none of the operators rewritten below
+    if not any(op in query for op in _RETS_OPERATOR_MARKERS):
+        return query
     
-    # Fix greater than operators: (Field>Value) -> (Field=Value+)
-    query = re.sub(r'\(([^=]+)>([^)]+)\)', r'(\1=\2+)', query)
-    
-    # Fix greater than or equal operators: (Field>=Value) -> (Field=Value+)
-    query = re.sub(r'\(([^=]+)>=([^)]+)\)', r'(\1=\2+)', query)
-    
-    # Fix less than operators: (Field<Value) -> (Field=-Value)
-    query = re.sub(r'\(([^=]+)<([^)]+)\)', r'(\1=-\2)', query)
-    
-    # Fix less than or equal operators: (Field<=Value) -> (Field=-Value)
-    query = re.sub(r'\(([^=]+)<=([^)]+)\)', r'(\1=-\2)', query)
-    
-    # Fix not equal operators: (Field!=Value) -> (Field!Value)
-    query = re.sub(r'\(([^=]+)!=([^)]+)\)', r'(\1!\2)', query)
-    
-    # Fix AND operators: (Field1=Value1) AND (Field2=Value2) -> (Field1=Value1),(Field2=Value2)
-    query = re.sub(r'\)\s+AND\s+\(', r'),(', query)
-    
-    # Fix OR operators: (Field1=Value1) OR (Field2=Value2) -> (Field1=Value1)|(Field2=Value2)
-    query = re.sub(r'\)\s+OR\s+\(', r')|(', query)
+    for pattern, replacement in _RETS_OPERATOR_FIXES:
+        query = pattern.sub(replacement, query)
     
     return query
 
@@ -839,10 +877,10 @@ def _extract_query_from_text(text, request, protocol):
     # Look for query patterns in the text
     if protocol == "RETS":
         # Look for DMQL patterns
-        query_match = re.search(r'\([^)]+\)(?:,\([^)]+\))*', text)
+        query_match = _DMQL_QUERY_RE.search(text)
     else:
         # Look for OData patterns
-        query_match = re.search(r'[A-Za-z]+\s+(eq|ne|gt|ge|lt|le)\s+[\'"]?[^\'"]+[\'"]?(?:\s+and\s+[A-Za-z]+\s+(eq|ne|gt|ge|lt|le)\s+[\'"]?[^\'"]+[\'"]?)*', text)
+        query_match = _ODATA_QUERY_RE.search(text)
     
     if query_match:
         query = query_match.group(0)
@@ -887,6 +925,21 @@ def _show_ai_analysis(ai_analysis):
 
 
 
+def _field_groups_frame(field_groups, label):
+    """
+    Build a Category/Count/Fields table from a mapping of group name to field list,
+    skipping empty groups and showing at most 10 field names per row.
+    """
+    rows = [
+        (
+            label(group),
+            len(fields),
+            ", ".join(fields[:10]) + (f"  … (+{len(fields) - 10})" if len(fields) > 10 else "")
+        )
+        for group, fields in field_groups.items() if fields
+    ]
+    return pd.DataFrame(rows, columns=["Category", "Count", "Fields"])
+
 def _show_debug_info(request, metadata, protocol):
     """
     Show comprehensive debugging information when AI query generation fails.
@@ -909,14 +962,10 @@ def _show_debug_info(request, metadata, protocol):
     for resource in metadata_summary['resources'][:10]:  # Show first 10
         st.write(f"- {resource['name']}: {resource['field_count']} fields")
     
-    # Show comprehensive field categories
+    # Show comprehensive field categories as a single table
     field_categories = metadata_summary['field_statistics']['field_categories']
     st.write("**🏷️ Field Categories Found:**")
-    for category, fields in field_categories.items():
-        if fields:
-            st.write(f"- {category.title()} ({len(fields)} fields): {', '.join(fields[:10])}")
-            if len(fields) > 10:
-                st.write(f"  ... and {len(fields) - 10} more {category} fields")
+    st.dataframe(_field_groups_frame(field_categories, str.title), hide_index=True)
     
     # Show lookup values found
     lookup_values = metadata_summary.get('lookup_values', {})
@@ -934,11 +983,10 @@ def _show_debug_info(request, metadata, protocol):
     # Show common field patterns
     st.write("**🔍 Common Field Patterns:**")
     common_fields = metadata_summary['common_fields']
-    for pattern, fields in common_fields.items():
-        if fields:
-            st.write(f"- {pattern.replace('_', ' ').title()}: {', '.join(fields[:10])}")
-            if len(fields) > 10:
-                st.write(f"  ... and {len(fields) - 10} more")
+    st.dataframe(
+        _field_groups_frame(common_fields, lambda pattern: pattern.replace('_', ' ').title()),
+        hide_index=True
+    )
     
     # Show field search suggestions based on user request
     st.write("**🎯 Field Search Suggestions:**")
@@ -1,13 +1,21 @@
 import pandas as pd
+import numpy as np
 import streamlit as st
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable
 import re
-from urllib.parse import urlparse
-import base64
+import io
+import functools
 from datetime import datetime, timedelta
 import json
+import hashlib
 import time
-from typing import Any, Dict, Optional, Union
+import heapq
+from collections import OrderedDict
+from itertools import accumulate, count
+from bisect import bisect_right
+
+# A URL scheme followed by a non-empty network location
+_URL_RE = re.compile(r'\s*[a-z][a-z0-9+.\-]*://[^/?#]', re.I)
 
 def validate_connection_params(url: str, username: str, password: str) -> bool:
     """
@@ -25,12 +33,8 @@ def validate_connection_params(url: str, username: str, password: str) -> bool:
     if not url or not username or not password:
         return False
     
-    # Basic URL validation
-    try:
-        parsed = urlparse(url)
-        if not parsed.scheme or not parsed.netloc:
-            return False
-    except:
+    # Basic URL validation: a scheme followed by a non-empty host part
+    if _URL_RE.match(url) is None:
         return False
     
     # Check for minimum length requirements
@@ -39,6 +43,12 @@ def validate_connection_params(url: str, username: str, password: str) -> bool:
     
     return True
 
+@functools.cache
+def _etree():
+    """Import lxml.etree on first use; only RESO metadata parsing needs it."""
+    from lxml import etree
+    return etree
+
 def format_metadata(metadata: Dict[str, Any], search_term: str = "", protocol: str = "RETS") -> Optional[pd.DataFrame]:
     """
     Format metadata for display in Streamlit.
@@ -54,155 +64,162 @@ def format_metadata(metadata: Dict[str, Any], search_term: str = "", protocol: s
     if not metadata:
         return None
     
+    # The full table is built once per distinct metadata; reruns only re-apply the search filter
+    metadata_key = hashlib.blake2b(json.dumps(metadata, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    built = _build_metadata_df(metadata_key, protocol, metadata)
+    if built is None:
+        return None
+    df, haystack = built
+    
+    # Apply search filter if provided
+    if search_term:
+        # One literal, case-insensitive pass over the prebuilt haystack
+        mask = haystack.str.contains(search_term, case=False, regex=False, na=False)
+        df = df[mask.to_numpy(dtype=bool)]
+    
+    if df.empty:
+        return None
+    # Boolean-mask indexing already yields a new DataFrame, and st.cache_data hands
+    # back its own copy of the unfiltered table, so no defensive copy is needed
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _build_metadata_df(metadata_key: str, protocol: str, _metadata: Dict[str, Any]) -> Optional[Tuple[pd.DataFrame, pd.Series]]:
+    """
+    Build the unfiltered metadata table for format_metadata.
+    
+    Args:
+        metadata_key: Content hash of the metadata, used as the cache key
+        protocol: Protocol type ("RETS" or "RESO Web API")
+        _metadata: Metadata dictionary (not hashed by Streamlit)
+        
+    Returns:
+        (Formatted DataFrame, search haystack) or None if no data
+    """
+    metadata = _metadata
+    
+    # Rows are (Category, Type, Name, Description, Value, Details) tuples.
+    # RETS and legacy rows have no Details (None) and are displayed without that column.
     formatted_data = []
     
     # Handle RESO Web API metadata format
     if protocol == "RESO Web API":
         if 'resources' in metadata:
             for resource in metadata['resources']:
-                formatted_data.append({
-                    'Category': 'Resource',
-                    'Type': 'EntitySet',
-                    'Name': resource,
-                    'Description': f'RESO {resource} resource',
-                    'Value': '',
-                    'Details': f'OData EntitySet for {resource}'
-                })
+                formatted_data.append((
+                    'Resource',
+                    'EntitySet',
+                    resource,
+                    f'RESO {resource} resource',
+                    '',
+                    f'OData EntitySet for {resource}'
+                ))
         
         # Parse XML metadata content if available
         if 'metadata_content' in metadata:
             try:
-                import xml.etree.ElementTree as ET
-                root = ET.fromstring(metadata['metadata_content'])
-                
-                # Extract schema information
-                for schema in root.iter():
-                    if schema.tag.endswith('Schema'):
-                        namespace = schema.get('Namespace', 'Unknown')
-                        formatted_data.append({
-                            'Category': 'Schema',
-                            'Type': 'Namespace', 
-                            'Name': namespace,
-                            'Description': 'RESO OData Schema',
-                            'Value': schema.get('Alias', ''),
-                            'Details': f'OData Schema: {namespace}'
-                        })
+                etree = _etree()
+                content = metadata['metadata_content']
+                if isinstance(content, str):
+                    content = content.encode('utf-8')
                 
-                # Extract entity types
-                for entity_type in root.iter():
-                    if entity_type.tag.endswith('EntityType'):
-                        name = entity_type.get('Name', '')
-                        key_props = []
-                        for key in entity_type.iter():
-                            if key.tag.endswith('Key'):
-                                for prop_ref in key.iter():
-                                    if prop_ref.tag.endswith('PropertyRef'):
-                                        key_props.append(prop_ref.get('Name', ''))
+                # Single streaming pass over the document; libxml2 filters the tags we care about.
+                # Rows are grouped per category so the output order matches Schema, EntityType, EnumType.
+                schema_rows, entity_rows, enum_rows = [], [], []
+                # Namespace-agnostic XPath lookups evaluated by libxml2, returning plain strings/numbers
+                key_names = etree.XPath("./*[local-name()='Key']/*[local-name()='PropertyRef']/@Name")
+                member_count_of = etree.XPath("count(./*[local-name()='Member'])")
+                context = etree.iterparse(
+                    io.BytesIO(content),
+                    events=('end',),
+                    tag=('{*}Schema', '{*}EntityType', '{*}EnumType'),
+                    huge_tree=True
+                )
+                for _, elem in context:
+                    kind = etree.QName(elem).localname
+                    
+                    if kind == 'Schema':
+                        # Extract schema information
+                        namespace = elem.get('Namespace', 'Unknown')
+                        schema_rows.append((
+                            'Schema',
+                            'Namespace',
+                            namespace,
+                            'RESO OData Schema',
+                            elem.get('Alias', ''),
+                            f'OData Schema: {namespace}'
+                        ))
+                    
+                    elif kind == 'EntityType':
+                        # Extract entity types
+                        name = elem.get('Name', '')
+                        key_props = [str(key_name) for key_name in key_names(elem)]
                         
-                        formatted_data.append({
-                            'Category': 'EntityType',
-                            'Type': 'Definition',
-                            'Name': name,
-                            'Description': f'Entity type definition for {name}',
-                            'Value': ', '.join(key_props) if key_props else '',
-                            'Details': f'Key Properties: {", ".join(key_props) if key_props else "None"}'
-                        })
+                        entity_rows.append((
+                            'EntityType',
+                            'Definition',
+                            name,
+                            f'Entity type definition for {name}',
+                            ', '.join(key_props) if key_props else '',
+                            f'Key Properties: {", ".join(key_props) if key_props else "None"}'
+                        ))
+                    
+                    else:
+                        # Extract enum types (lookup values)
+                        name = elem.get('Name', '')
+                        member_count = int(member_count_of(elem))
+                        enum_rows.append((
+                            'EnumType',
+                            'Lookup',
+                            name,
+                            f'Enumeration type with {member_count} values',
+                            str(member_count),
+                            f'Lookup values for {name} field'
+                        ))
+                    
+                    # Free the processed subtree and its already-handled siblings to keep memory flat
+                    if kind != 'Schema':
+                        elem.clear()
+                        while elem.getprevious() is not None:
+                            del elem.getparent()[0]
                 
-                # Extract enum types (lookup values)
-                for enum_type in root.iter():
-                    if enum_type.tag.endswith('EnumType'):
-                        name = enum_type.get('Name', '')
-                        member_count = len([m for m in enum_type.iter() if m.tag.endswith('Member')])
-                        formatted_data.append({
-                            'Category': 'EnumType',
-                            'Type': 'Lookup',
-                            'Name': name,
-                            'Description': f'Enumeration type with {member_count} values',
-                            'Value': str(member_count),
-                            'Details': f'Lookup values for {name} field'
-                        })
+                formatted_data.extend(schema_rows)
+                formatted_data.extend(entity_rows)
+                formatted_data.extend(enum_rows)
                         
             except Exception as e:
-                formatted_data.append({
-                    'Category': 'Error',
-                    'Type': 'XML Parse',
-                    'Name': 'Metadata Parse Error',
-                    'Description': str(e),
-                    'Value': '',
-                    'Details': 'Failed to parse RESO metadata XML'
-                })
+                formatted_data.append((
+                    'Error',
+                    'XML Parse',
+                    'Metadata Parse Error',
+                    str(e),
+                    '',
+                    'Failed to parse RESO metadata XML'
+                ))
     
     # Handle RETS metadata format (existing logic)
     elif isinstance(metadata, dict):
         for metadata_type, metadata_content in metadata.items():
-            if metadata_type == 'SYSTEM' and metadata_content:
-                if isinstance(metadata_content, dict) and 'system' in metadata_content:
-                    for key, value in metadata_content['system'].items():
-                        formatted_data.append({
-                            'Category': 'System',
-                            'Type': 'System Info',
-                            'Name': key,
-                            'Value': str(value)[:100],
-                            'Description': f'System {key}'
-                        })
-            
-            elif metadata_type == 'RESOURCE' and metadata_content:
-                if isinstance(metadata_content, dict) and 'resources' in metadata_content:
-                    for resource in metadata_content['resources']:
-                        if isinstance(resource, dict):
-                            name = resource.get('ResourceID') or resource.get('StandardName') or 'Unknown'
-                            description = resource.get('Description') or resource.get('LongName') or 'Resource'
-                            formatted_data.append({
-                                'Category': 'Resource',
-                                'Type': 'Resource',
-                                'Name': name,
-                                'Value': name,
-                                'Description': description[:100]
-                            })
-            
-            elif metadata_type.startswith('CLASS_') and metadata_content:
-                resource_name = metadata_type.replace('CLASS_', '')
-                if isinstance(metadata_content, dict) and 'classes' in metadata_content:
-                    for class_info in metadata_content['classes']:
-                        if isinstance(class_info, dict):
-                            name = class_info.get('ClassName') or class_info.get('StandardName') or 'Unknown'
-                            description = class_info.get('Description') or class_info.get('LongName') or 'Class'
-                            formatted_data.append({
-                                'Category': 'Class',
-                                'Type': f'Class ({resource_name})',
-                                'Name': name,
-                                'Value': name,
-                                'Description': description[:100]
-                            })
-            
-            elif metadata_type.startswith('TABLE_') and metadata_content:
-                resource_class = metadata_type.replace('TABLE_', '').replace('_', ':')
-                if isinstance(metadata_content, dict) and 'fields' in metadata_content:
-                    for field in metadata_content['fields']:
-                        if isinstance(field, dict):
-                            name = field.get('SystemName') or field.get('StandardName') or field.get('LongName') or 'Unknown'
-                            field_type = field.get('DataType') or field.get('Interpretation') or 'Unknown'
-                            description = field.get('LongName') or field.get('ShortName') or 'Field'
-                            formatted_data.append({
-                                'Category': 'Field',
-                                'Type': f'Field ({resource_class}) - {field_type}',
-                                'Name': name,
-                                'Value': name,
-                                'Description': description[:100]
-                            })
+            section, sep, suffix = metadata_type.partition('_')
+            section_rows = _RETS_SECTION_ROWS.get(section + sep)
+            # RETSClient.get_metadata builds each section as a dict of lists of dicts,
+            # so the shape is checked once per section rather than once per item
+            if section_rows and metadata_content and isinstance(metadata_content, dict):
+                formatted_data.extend(section_rows(suffix, metadata_content))
     
     # Handle simple metadata structure (legacy/fallback)
     if not formatted_data:
         # Process system information
         if 'system' in metadata:
             for key, value in metadata['system'].items():
-                formatted_data.append({
-                    'Category': 'System',
-                    'Type': key,
-                    'Name': key,
-                    'Value': str(value)[:100],  # Truncate long values
-                    'Description': f'System {key}'
-                })
+                formatted_data.append((
+                    'System',
+                    key,
+                    key,
+                    f'System {key}',
+                    str(value)[:100],  # Truncate long values
+                    None
+                ))
         
         # Process resources
         if 'resources' in metadata:
@@ -210,13 +227,14 @@ def format_metadata(metadata: Dict[str, Any], search_term: str = "", protocol: s
                 if isinstance(resource, dict):
                     name = resource.get('name') or resource.get('ResourceID') or 'Unknown'
                     description = resource.get('description') or resource.get('desc') or 'Resource'
-                    formatted_data.append({
-                        'Category': 'Resource',
-                        'Type': 'Resource',
-                        'Name': name,
-                        'Value': name,
-                        'Description': description
-                    })
+                    formatted_data.append((
+                        'Resource',
+                        'Resource',
+                        name,
+                        description,
+                        name,
+                        None
+                    ))
         
         # Process classes
         if 'classes' in metadata:
@@ -225,13 +243,14 @@ def format_metadata(metadata: Dict[str, Any], search_term: str = "", protocol: s
                     name = class_info.get('name') or class_info.get('ClassName') or 'Unknown'
                     description = class_info.get('description') or class_info.get('desc') or 'Class'
                     resource = class_info.get('resource') or 'Unknown'
-                    formatted_data.append({
-                        'Category': 'Class',
-                        'Type': f'Class ({resource})',
-                        'Name': name,
-                        'Value': name,
-                        'Description': description
-                    })
+                    formatted_data.append((
+                        'Class',
+                        f'Class ({resource})',
+                        name,
+                        description,
+                        name,
+                        None
+                    ))
         
         # Process fields
         if 'fields' in metadata:
@@ -241,34 +260,111 @@ def format_metadata(metadata: Dict[str, Any], search_term: str = "", protocol: s
                     field_type = field_info.get('type') or field_info.get('DataType') or 'Unknown'
                     description = field_info.get('description') or field_info.get('desc') or 'Field'
                     resource = field_info.get('resource') or 'Unknown'
-                    formatted_data.append({
-                        'Category': 'Field',
-                        'Type': f'Field ({resource}) - {field_type}',
-                        'Name': name,
-                        'Value': name,
-                        'Description': description
-                    })
+                    formatted_data.append((
+                        'Field',
+                        f'Field ({resource}) - {field_type}',
+                        name,
+                        description,
+                        name,
+                        None
+                    ))
     
     if not formatted_data:
         return None
     
-    # Create DataFrame
-    df = pd.DataFrame(formatted_data)
+    # Create DataFrame column-wise from the row tuples
+    categories, types, names, descriptions, values, details = map(list, zip(*formatted_data))
+    if details[0] is None:
+        df = pd.DataFrame({
+            'Category': categories,
+            'Type': types,
+            'Name': names,
+            'Value': values,
+            'Description': descriptions
+        })
+    else:
+        df = pd.DataFrame({
+            'Category': categories,
+            'Type': types,
+            'Name': names,
+            'Description': descriptions,
+            'Value': values,
+            'Details': details
+        })
+    
+    # Searchable text for format_metadata: the searched columns joined with a unit
+    # separator, so a match can never span two columns. Arrow-backed so the search
+    # is one pass of Arrow's match_substring kernel.
+    haystack = (
+        df['Name'].fillna('') + '\x1f' +
+        df['Description'].fillna('') + '\x1f' +
+        df['Type'].fillna('') + '\x1f' +
+        df['Value'].fillna('')
+    ).astype('string[pyarrow]')
+    return df, haystack
+
+def _rets_system_rows(_suffix: str, content: Dict[str, Any]) -> List[tuple]:
+    """Metadata table rows for the RETS SYSTEM section."""
+    return [
+        ('System', 'System Info', key, f'System {key}', str(value)[:100], None)
+        for key, value in content.get('system', {}).items()
+    ]
+
+def _rets_resource_rows(_suffix: str, content: Dict[str, Any]) -> List[tuple]:
+    """Metadata table rows for the RETS RESOURCE section."""
+    rows = []
+    for resource in content.get('resources', ()):
+        name = resource.get('ResourceID') or resource.get('StandardName') or 'Unknown'
+        description = resource.get('Description') or resource.get('LongName') or 'Resource'
+        rows.append(('Resource', 'Resource', name, description[:100], name, None))
+    return rows
+
+def _rets_class_rows(resource_name: str, content: Dict[str, Any]) -> List[tuple]:
+    """Metadata table rows for a RETS CLASS_<resource> section."""
+    rows = []
+    for class_info in content.get('classes', ()):
+        name = class_info.get('ClassName') or class_info.get('StandardName') or 'Unknown'
+        description = class_info.get('Description') or class_info.get('LongName') or 'Class'
+        rows.append(('Class', f'Class ({resource_name})', name, description[:100], name, None))
+    return rows
+
+def _rets_table_rows(table_name: str, content: Dict[str, Any]) -> List[tuple]:
+    """Metadata table rows for a RETS TABLE_<resource>_<class> section."""
+    resource_class = table_name.replace('_', ':')
+    rows = []
+    for field in content.get('fields', ()):
+        name = field.get('SystemName') or field.get('StandardName') or field.get('LongName') or 'Unknown'
+        field_type = field.get('DataType') or field.get('Interpretation') or 'Unknown'
+        description = field.get('LongName') or field.get('ShortName') or 'Field'
+        rows.append(('Field', f'Field ({resource_class}) - {field_type}', name, description[:100], name, None))
+    return rows
+
+# Row builders for the RETS metadata sections, keyed by the whole 'SYSTEM'/'RESOURCE'
+# key or by the 'CLASS_'/'TABLE_' prefix; each builder receives the rest of the key
+_RETS_SECTION_ROWS = {
+    'SYSTEM': _rets_system_rows,
+    'RESOURCE': _rets_resource_rows,
+    'CLASS_': _rets_class_rows,
+    'TABLE_': _rets_table_rows,
+}
+
+def dataframe_to_csv_bytes(df: pd.DataFrame, index: bool = False) -> bytes:
+    """
+    Serialize a DataFrame to UTF-8 CSV bytes.
     
-    # Apply search filter if provided
-    if search_term:
-        search_term = search_term.lower()
-        mask = (
-            df['Name'].str.lower().str.contains(search_term, na=False) |
-            df['Description'].str.lower().str.contains(search_term, na=False) |
-            df['Type'].str.lower().str.contains(search_term, na=False) |
-            df['Value'].str.lower().str.contains(search_term, na=False)
-        )
-        df = df[mask]
+    The CSV is written straight into a bytes buffer, so it is encoded once and never
+    held as a str first.
     
-    if df.empty:
-        return None
-    return df.copy()  # Ensure we return a DataFrame, not a Series
+    Args:
+        df: DataFrame to serialize
+        index: Whether to include the row index
+        
+    Returns:
+        CSV content as bytes
+    """
+    csv_buffer = io.BytesIO()
+    df.to_csv(csv_buffer, index=index, encoding='utf-8')
+    return csv_buffer.getvalue()
 
 def create_download_link(df: pd.DataFrame, filename: str) -> str:
     """
@@ -281,8 +377,9 @@ def create_download_link(df: pd.DataFrame, filename: str) -> str:
     Returns:
         HTML download link
     """
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
+    import base64
+    
+    b64 = base64.b64encode(dataframe_to_csv_bytes(df)).decode('ascii')
     href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download CSV</a>'
     return href
 
@@ -303,25 +400,93 @@ def format_query_results(results: List[Dict[str, Any]]) -> pd.DataFrame:
     df = pd.DataFrame(results)
     
     # Clean up column names
-    df.columns = [col.replace('_', ' ').title() for col in df.columns]
-    
-    # Handle common data types
-    for col in df.columns:
-        if 'price' in col.lower():
-            # Try to convert price columns to numeric
-            try:
-                df[col] = pd.to_numeric(df[col], errors='ignore')
-            except:
-                pass
-        elif 'date' in col.lower() or 'timestamp' in col.lower():
-            # Try to convert date columns
-            try:
-                df[col] = pd.to_datetime(df[col], errors='ignore')
-            except:
-                pass
+    df.columns = df.columns.str.replace('_', ' ', regex=False).str.title()
+    
+    # Classify all columns at once; price takes precedence over date
+    lowered = df.columns.str.lower()
+    price_mask = lowered.str.contains('price', regex=False)
+    date_mask = lowered.str.contains('date|timestamp', regex=True) & ~price_mask
+    
+    # Convert only the matching columns, leaving a column untouched if any value fails to parse
+    for col in df.columns[price_mask]:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
+    for col in df.columns[date_mask]:
+        try:
+            df[col] = pd.to_datetime(df[col])
+        except (ValueError, TypeError, OverflowError):
+            pass
     
     return df
 
+def session_memo(key: str, source: Any, build: Optional[Callable[[], Any]] = None, args: tuple = ()) -> Any:
+    """
+    Memoize a value derived from source in st.session_state[key].
+    
+    The stored value is reused while source is the same object and args are equal,
+    and is otherwise replaced by build(). The entry holds source itself, so its id
+    cannot be reused by a new object while the value is cached.
+    
+    Args:
+        key: Session state key for the entry
+        source: Object the value is derived from, compared by identity
+        build: Zero-argument callable producing the value; if None, nothing is built
+        args: Extra inputs the value depends on, compared by equality
+        
+    Returns:
+        The memoized or newly built value, or None if there is none and no build
+    """
+    cached = st.session_state.get(key)
+    if cached is not None and cached[0] is source and cached[1] == args:
+        return cached[2]
+    if build is None:
+        return None
+    value = build()
+    st.session_state[key] = (source, args, value)
+    return value
+
+def get_results_df() -> pd.DataFrame:
+    """
+    Get st.session_state.query_results as a DataFrame.
+    
+    The frame is built once per result set and reused on later reruns; a new query
+    assigns a new results object, which rebuilds it. Callers must not modify it.
+    
+    Returns:
+        DataFrame of the current query results
+    """
+    results = st.session_state.query_results
+    return session_memo('query_results_df', results, lambda: pd.DataFrame(results))
+
+# Rows deep-measured by estimate_memory_usage before scaling to the whole frame
+_MEMORY_SAMPLE_ROWS = 100
+
+def estimate_memory_usage(df: pd.DataFrame) -> int:
+    """
+    Estimate the memory used by a DataFrame, including its text, in bytes.
+    
+    A full deep measure walks every Python object in object columns, so frames with
+    more than _MEMORY_SAMPLE_ROWS rows are deep-measured on evenly spaced rows only and
+    the per-row size is scaled to the full length.
+    
+    Args:
+        df: DataFrame to measure
+        
+    Returns:
+        Estimated size in bytes
+    """
+    if len(df) <= _MEMORY_SAMPLE_ROWS:
+        return int(df.memory_usage(deep=True).sum())
+    
+    sample = df.iloc[::len(df) // _MEMORY_SAMPLE_ROWS]
+    per_row = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    return int(per_row * len(df) + df.index.memory_usage())
+
+# Characters allowed in a query string by validate_query_params
+_QUERY_CHARS_RE = re.compile(r'[\w\s(),=+\-*.<>]*')
+
 def validate_query_params(resource: str, class_name: str, query: str) -> tuple[bool, str]:
     """
     Validate query parameters.
@@ -341,11 +506,50 @@ def validate_query_params(resource: str, class_name: str, query: str) -> tuple[b
         return False, "Class name is required"
     
     # Basic query validation
-    if query and not re.match(r'^[\w\s\(\),=\+\-\*\.<>]*$', query):
+    if query and _QUERY_CHARS_RE.fullmatch(query) is None:
         return False, "Query contains invalid characters"
     
     return True, ""
 
+# Sample queries shown for demonstration; built once and copied per call
+_SAMPLE_QUERIES: Tuple[Dict[str, str], ...] = (
+    {
+        'name': 'Active Listings',
+        'resource': 'Property',
+        'class': 'ResidentialProperty',
+        'query': '(Status=Active)',
+        'description': 'Find all active property listings'
+    },
+    {
+        'name': 'Price Range',
+        'resource': 'Property',
+        'class': 'ResidentialProperty',
+        'query': '(ListPrice=100000-500000)',
+        'description': 'Properties between $100k and $500k'
+    },
+    {
+        'name': 'Recently Modified',
+        'resource': 'Property',
+        'class': 'ResidentialProperty',
+        'query': '(ModificationTimestamp=2024-01-01T00:00:00+)',
+        'description': 'Properties modified since January 1, 2024'
+    },
+    {
+        'name': 'Specific City',
+        'resource': 'Property',
+        'class': 'ResidentialProperty',
+        'query': '(City=Austin)',
+        'description': 'Properties in Austin'
+    },
+    {
+        'name': 'Bedrooms and Bathrooms',
+        'resource': 'Property',
+        'class': 'ResidentialProperty',
+        'query': '(Bedrooms=3+),(Bathrooms=2+)',
+        'description': 'Properties with 3+ bedrooms and 2+ bathrooms'
+    }
+)
+
 def get_sample_queries() -> List[Dict[str, str]]:
     """
     Get sample queries for demonstration.
@@ -353,43 +557,7 @@ def get_sample_queries() -> List[Dict[str, str]]:
     Returns:
         List of sample query dictionaries
     """
-    return [
-        {
-            'name': 'Active Listings',
-            'resource': 'Property',
-            'class': 'ResidentialProperty',
-            'query': '(Status=Active)',
-            'description': 'Find all active property listings'
-        },
-        {
-            'name': 'Price Range',
-            'resource': 'Property',
-            'class': 'ResidentialProperty',
-            'query': '(ListPrice=100000-500000)',
-            'description': 'Properties between $100k and $500k'
-        },
-        {
-            'name': 'Recently Modified',
-            'resource': 'Property',
-            'class': 'ResidentialProperty',
-            'query': '(ModificationTimestamp=2024-01-01T00:00:00+)',
-            'description': 'Properties modified since January 1, 2024'
-        },
-        {
-            'name': 'Specific City',
-            'resource': 'Property',
-            'class': 'ResidentialProperty',
-            'query': '(City=Austin)',
-            'description': 'Properties in Austin'
-        },
-        {
-            'name': 'Bedrooms and Bathrooms',
-            'resource': 'Property',
-            'class': 'ResidentialProperty',
-            'query': '(Bedrooms=3+),(Bathrooms=2+)',
-            'description': 'Properties with 3+ bedrooms and 2+ bathrooms'
-        }
-    ]
+    return [dict(query) for query in _SAMPLE_QUERIES]
 
 def format_field_info(field_info: Dict[str, Any]) -> str:
     """
@@ -433,30 +601,48 @@ def clean_data_for_export(df: pd.DataFrame) -> pd.DataFrame:
     # Create a copy to avoid modifying original
     cleaned_df = df.copy()
     
-    # Remove or replace problematic characters
-    for col in cleaned_df.select_dtypes(include=['object']).columns:
-        cleaned_df[col] = cleaned_df[col].astype(str).str.replace('\n', ' ').str.replace('\r', ' ')
+    # Replace each CR or LF with a space in a single regex pass per column. The pattern
+    # is passed as a string so string-typed columns can use pyarrow's regex kernel.
+    for col in cleaned_df.select_dtypes(include=['object', 'string']).columns:
+        cleaned_df[col] = cleaned_df[col].astype(str).str.replace(r'[\r\n]', ' ', regex=True)
     
     # Handle missing values
     cleaned_df = cleaned_df.fillna('')
     
     return cleaned_df
 
-def get_connection_tips() -> List[str]:
+# Connection troubleshooting tips; built once and shared read-only
+_CONNECTION_TIPS: Tuple[str, ...] = (
+    "Ensure your RETs URL includes the protocol (http:// or https://)",
+    "Check that your username and password are correct",
+    "Some RETs servers require specific User-Agent headers",
+    "Verify that your IP address is whitelisted with the RETs provider",
+    "Try connecting during off-peak hours if experiencing timeouts",
+    "Contact your RETs provider if authentication continues to fail"
+)
+
+def get_connection_tips() -> Tuple[str, ...]:
     """
     Get tips for RETs connection.
     
     Returns:
-        List of connection tips
+        Tuple of connection tips
     """
-    return [
-        "Ensure your RETs URL includes the protocol (http:// or https://)",
-        "Check that your username and password are correct",
-        "Some RETs servers require specific User-Agent headers",
-        "Verify that your IP address is whitelisted with the RETs provider",
-        "Try connecting during off-peak hours if experiencing timeouts",
-        "Contact your RETs provider if authentication continues to fail"
-    ]
+    return _CONNECTION_TIPS
+
+def _rets_tables(metadata):
+    """
+    Get the (table name, fields) pairs of the TABLE_<resource>_<class> sections in RETS metadata.
+    
+    The list is memoized per metadata object, so the suggestion and field search
+    helpers do not re-scan every metadata key per call.
+    """
+    return session_memo('rets_tables', metadata, lambda: [
+        (metadata_type[len('TABLE_'):], metadata_content['fields'])
+        for metadata_type, metadata_content in metadata.items()
+        if metadata_type.startswith('TABLE_') and metadata_content
+        and isinstance(metadata_content, dict) and 'fields' in metadata_content
+    ])
 
 def analyze_metadata_for_suggestions(metadata, protocol="RETS"):
     """
@@ -479,217 +665,185 @@ def analyze_metadata_for_suggestions(metadata, protocol="RETS"):
             if isinstance(resource_data, dict):
                 properties = resource_data.get('properties', [])
                 
-                # Extract field information
-                fields = {}
+                # Extract field information as (name, lowercased name, lowercased type) tuples
+                fields = []
                 for prop in properties:
                     if isinstance(prop, dict):
                         field_name = prop.get('name', '')
                         field_type = prop.get('type', '').lower()
-                        fields[field_name] = field_type
+                        fields.append((field_name, field_name.lower(), field_type))
                 
                 # Generate suggestions based on field patterns
                 suggestions = _generate_reso_suggestions(fields, resource_name, suggestions)
     
     else:
         # Analyze RETS metadata
-        for metadata_type, metadata_content in metadata.items():
-            if metadata_type.startswith('TABLE_') and metadata_content:
-                if isinstance(metadata_content, dict) and 'fields' in metadata_content:
-                    fields = {}
-                    for field in metadata_content['fields']:
-                        if isinstance(field, dict):
-                            field_name = field.get('SystemName', field.get('StandardName', ''))
-                            data_type = field.get('DataType', '').lower()
-                            fields[field_name] = data_type
-                    
-                    # Generate suggestions based on field patterns
-                    suggestions = _generate_rets_suggestions(fields, metadata_type.replace('TABLE_', ''), suggestions)
+        for table_name, table_fields in _rets_tables(metadata):
+            # (name, lowercased name, lowercased data type) tuples
+            fields = []
+            for field in table_fields:
+                if isinstance(field, dict):
+                    field_name = field.get('SystemName', field.get('StandardName', ''))
+                    data_type = field.get('DataType', '').lower()
+                    fields.append((field_name, field_name.lower(), data_type))
+            
+            # Generate suggestions based on field patterns
+            suggestions = _generate_rets_suggestions(fields, table_name, suggestions)
     
     return suggestions
 
-def _generate_reso_suggestions(fields, resource_name, suggestions):
-    """Generate RESO-specific query suggestions."""
+# Field classes used to pick fields for generated suggestions, as lowercase substrings.
+# A field may fall into several classes.
+_FIELD_CLASS_TERMS = {
+    'price': ('price', 'value'),
+    'status': ('status',),
+    'location': ('city', 'state', 'zip', 'county', 'address'),
+    'property': ('type', 'category'),
+    'date': ('date', 'timestamp', 'modified', 'created'),
+    'bedroom': ('bedroom', 'beds'),
+    'bathroom': ('bathroom', 'baths'),
+}
+
+# Classes of every lowercased field name seen so far, filled by _classify_fields.
+# Cleared when it outgrows _FIELD_CLASS_TABLE_MAX so unusual servers can't grow it unbounded.
+_field_class_table: Dict[str, frozenset] = {}
+_FIELD_CLASS_TABLE_MAX = 4096
+
+def _scan_field_classes(lowered):
+    """
+    Return the frozenset of _FIELD_CLASS_TERMS classes for each lowercased name.
+    
+    The names are packed into one newline-separated string and every term is
+    located with str.find over the whole block; hits are mapped back to names by offset.
+    """
+    packed = '\n'.join(lowered)
+    starts = [0, *accumulate(len(name) + 1 for name in lowered)]
+    
+    classes = [set() for _ in lowered]
+    for field_class, terms in _FIELD_CLASS_TERMS.items():
+        for term in terms:
+            pos = packed.find(term)
+            while pos != -1:
+                index = bisect_right(starts, pos) - 1
+                classes[index].add(field_class)
+                # Skip the rest of this name, it is already classified
+                pos = packed.find(term, starts[index + 1])
+    return [frozenset(name_classes) for name_classes in classes]
+
+def _classify_fields(fields):
+    """
+    Sort field names into _FIELD_CLASS_TERMS buckets, preserving field order.
+    Takes the (name, lowercased name, lowercased type) tuples built by analyze_metadata_for_suggestions.
     
-    # Price-related fields
-    price_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['price', 'listprice', 'saleprice', 'value'])]
-    if price_fields:
-        suggestions['price_queries'].extend([
-            {
-                'name': f'Active Listings Under $500k',
-                'query': f"{price_fields[0]} lt 500000 and StandardStatus eq 'Active'",
-                'description': f'Find active listings priced under $500,000 using {price_fields[0]}',
-                'resource': resource_name
-            },
-            {
-                'name': f'Price Range $200k-$400k',
-                'query': f"{price_fields[0]} ge 200000 and {price_fields[0]} le 400000",
-                'description': f'Properties in the $200k-$400k range using {price_fields[0]}',
-                'resource': resource_name
-            }
-        ])
-    
-    # Status fields
-    status_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['status', 'standardstatus', 'listingstatus'])]
-    if status_fields:
-        suggestions['status_queries'].extend([
-            {
-                'name': 'Active Listings Only',
-                'query': f"{status_fields[0]} eq 'Active'",
-                'description': f'Show only active listings using {status_fields[0]}',
-                'resource': resource_name
-            },
-            {
-                'name': 'Recently Sold',
-                'query': f"{status_fields[0]} eq 'Closed'",
-                'description': f'Show recently sold properties using {status_fields[0]}',
-                'resource': resource_name
-            }
-        ])
-    
-    # Location fields
-    location_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['city', 'state', 'zip', 'county', 'address'])]
-    if location_fields:
-        suggestions['location_queries'].extend([
-            {
-                'name': 'Properties in Specific City',
-                'query': f"{location_fields[0]} eq 'Austin'",
-                'description': f'Filter by city using {location_fields[0]} (replace Austin with your city)',
-                'resource': resource_name
-            }
-        ])
-    
-    # Property type fields
-    property_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['propertytype', 'type', 'category'])]
-    if property_fields:
-        suggestions['property_queries'].extend([
-            {
-                'name': 'Residential Properties Only',
-                'query': f"{property_fields[0]} eq 'Residential'",
-                'description': f'Filter for residential properties using {property_fields[0]}',
-                'resource': resource_name
-            }
-        ])
-    
-    # Date fields
-    date_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['date', 'timestamp', 'modified', 'created'])]
-    if date_fields:
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        suggestions['date_queries'].extend([
-            {
-                'name': 'Listings Updated This Month',
-                'query': f"{date_fields[0]} ge {current_date[:7]}-01",
-                'description': f'Properties updated this month using {date_fields[0]}',
-                'resource': resource_name
-            }
-        ])
-    
-    # Bedroom/Bathroom fields
-    bedroom_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['bedroom', 'beds'])]
-    bathroom_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['bathroom', 'baths'])]
-    
-    if bedroom_fields and bathroom_fields:
-        suggestions['property_queries'].extend([
-            {
-                'name': '3+ Bedrooms, 2+ Bathrooms',
-                'query': f"{bedroom_fields[0]} ge 3 and {bathroom_fields[0]} ge 2",
-                'description': f'Properties with 3+ bedrooms and 2+ bathrooms',
-                'resource': resource_name
-            }
-        ])
+    Names not yet in _field_class_table are classified together with one block scan,
+    so later resources, tables and reruns only pay for dictionary lookups.
+    
+    The table is shared by every session thread and may be cleared by another call at
+    any time, so this call reads only from its own classes mapping and just writes
+    its scan results back.
+    """
+    classes = {}
+    missing = []
+    for lowered_name in dict.fromkeys(lowered_name for _, lowered_name, _ in fields):
+        known = _field_class_table.get(lowered_name)
+        if known is None:
+            missing.append(lowered_name)
+        else:
+            classes[lowered_name] = known
+    
+    if missing:
+        scanned = dict(zip(missing, _scan_field_classes(missing)))
+        classes.update(scanned)
+        if len(_field_class_table) + len(scanned) > _FIELD_CLASS_TABLE_MAX:
+            _field_class_table.clear()
+        _field_class_table.update(scanned)
+    
+    buckets = {field_class: [] for field_class in _FIELD_CLASS_TERMS}
+    for field_name, lowered_name, _ in fields:
+        for field_class in classes[lowered_name]:
+            buckets[field_class].append(field_name)
+    return buckets
+
+# Suggestion templates, filled with the first field name of each class at call time:
+# (suggestion category, required field classes, name, query template, description template)
+_RESO_SUGGESTION_TEMPLATES = (
+    ('price_queries', ('price',), 'Active Listings Under $500k',
+     "{price} lt 500000 and StandardStatus eq 'Active'",
+     'Find active listings priced under $500,000 using {price}'),
+    ('price_queries', ('price',), 'Price Range $200k-$400k',
+     "{price} ge 200000 and {price} le 400000",
+     'Properties in the $200k-$400k range using {price}'),
+    ('status_queries', ('status',), 'Active Listings Only',
+     "{status} eq 'Active'",
+     'Show only active listings using {status}'),
+    ('status_queries', ('status',), 'Recently Sold',
+     "{status} eq 'Closed'",
+     'Show recently sold properties using {status}'),
+    ('location_queries', ('location',), 'Properties in Specific City',
+     "{location} eq 'Austin'",
+     'Filter by city using {location} (replace Austin with your city)'),
+    ('property_queries', ('property',), 'Residential Properties Only',
+     "{property} eq 'Residential'",
+     'Filter for residential properties using {property}'),
+    ('date_queries', ('date',), 'Listings Updated This Month',
+     "{date} ge {month_start}",
+     'Properties updated this month using {date}'),
+    ('property_queries', ('bedroom', 'bathroom'), '3+ Bedrooms, 2+ Bathrooms',
+     "{bedroom} ge 3 and {bathroom} ge 2",
+     'Properties with 3+ bedrooms and 2+ bathrooms'),
+)
+
+_RETS_SUGGESTION_TEMPLATES = (
+    ('price_queries', ('price',), 'Active Listings Under $500k',
+     "(Status=Active),({price}=-500000)",
+     'Find active listings priced under $500,000 using {price}'),
+    ('price_queries', ('price',), 'Price Range $200k-$400k',
+     "({price}=200000-400000)",
+     'Properties in the $200k-$400k range using {price}'),
+    ('status_queries', ('status',), 'Active Listings Only',
+     "({status}=Active)",
+     'Show only active listings using {status}'),
+    ('status_queries', ('status',), 'Recently Sold',
+     "({status}=Closed)",
+     'Show recently sold properties using {status}'),
+    ('location_queries', ('location',), 'Properties in Specific City',
+     "({location}=Austin)",
+     'Filter by city using {location} (replace Austin with your city)'),
+    ('property_queries', ('property',), 'Residential Properties Only',
+     "({property}=Residential)",
+     'Filter for residential properties using {property}'),
+    ('date_queries', ('date',), 'Listings Updated This Month',
+     "({date}={month_start}+)",
+     'Properties updated this month using {date}'),
+    ('property_queries', ('bedroom', 'bathroom'), '3+ Bedrooms, 2+ Bathrooms',
+     "({bedroom}=3+),({bathroom}=2+)",
+     'Properties with 3+ bedrooms and 2+ bathrooms'),
+)
+
+def _fill_suggestion_templates(templates, fields, source_key, source_name, suggestions):
+    """Append every template whose field classes are all present in fields."""
+    buckets = _classify_fields(fields)
+    values = {field_class: names[0] for field_class, names in buckets.items() if names}
+    values['month_start'] = datetime.now().strftime('%Y-%m-01')
+    
+    for category, required, name, query_template, description_template in templates:
+        if all(field_class in values for field_class in required):
+            suggestions[category].append({
+                'name': name,
+                'query': query_template.format_map(values),
+                'description': description_template.format_map(values),
+                source_key: source_name
+            })
     
     return suggestions
 
+def _generate_reso_suggestions(fields, resource_name, suggestions):
+    """Generate RESO-specific query suggestions."""
+    return _fill_suggestion_templates(_RESO_SUGGESTION_TEMPLATES, fields, 'resource', resource_name, suggestions)
+
 def _generate_rets_suggestions(fields, table_name, suggestions):
     """Generate RETS-specific query suggestions."""
-    
-    # Price-related fields
-    price_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['price', 'listprice', 'saleprice', 'value'])]
-    if price_fields:
-        suggestions['price_queries'].extend([
-            {
-                'name': f'Active Listings Under $500k',
-                'query': f"(Status=Active),({price_fields[0]}=-500000)",
-                'description': f'Find active listings priced under $500,000 using {price_fields[0]}',
-                'table': table_name
-            },
-            {
-                'name': f'Price Range $200k-$400k',
-                'query': f"({price_fields[0]}=200000-400000)",
-                'description': f'Properties in the $200k-$400k range using {price_fields[0]}',
-                'table': table_name
-            }
-        ])
-    
-    # Status fields
-    status_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['status', 'listingstatus'])]
-    if status_fields:
-        suggestions['status_queries'].extend([
-            {
-                'name': 'Active Listings Only',
-                'query': f"({status_fields[0]}=Active)",
-                'description': f'Show only active listings using {status_fields[0]}',
-                'table': table_name
-            },
-            {
-                'name': 'Recently Sold',
-                'query': f"({status_fields[0]}=Closed)",
-                'description': f'Show recently sold properties using {status_fields[0]}',
-                'table': table_name
-            }
-        ])
-    
-    # Location fields
-    location_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['city', 'state', 'zip', 'county', 'address'])]
-    if location_fields:
-        suggestions['location_queries'].extend([
-            {
-                'name': 'Properties in Specific City',
-                'query': f"({location_fields[0]}=Austin)",
-                'description': f'Filter by city using {location_fields[0]} (replace Austin with your city)',
-                'table': table_name
-            }
-        ])
-    
-    # Property type fields
-    property_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['propertytype', 'type', 'category'])]
-    if property_fields:
-        suggestions['property_queries'].extend([
-            {
-                'name': 'Residential Properties Only',
-                'query': f"({property_fields[0]}=Residential)",
-                'description': f'Filter for residential properties using {property_fields[0]}',
-                'table': table_name
-            }
-        ])
-    
-    # Date fields
-    date_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['date', 'timestamp', 'modified', 'created'])]
-    if date_fields:
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        suggestions['date_queries'].extend([
-            {
-                'name': 'Listings Updated This Month',
-                'query': f"({date_fields[0]}={current_date[:7]}-01+)",
-                'description': f'Properties updated this month using {date_fields[0]}',
-                'table': table_name
-            }
-        ])
-    
-    # Bedroom/Bathroom fields
-    bedroom_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['bedroom', 'beds'])]
-    bathroom_fields = [f for f in fields.keys() if any(term in f.lower() for term in ['bathroom', 'baths'])]
-    
-    if bedroom_fields and bathroom_fields:
-        suggestions['property_queries'].extend([
-            {
-                'name': '3+ Bedrooms, 2+ Bathrooms',
-                'query': f"({bedroom_fields[0]}=3+),({bathroom_fields[0]}=2+)",
-                'description': f'Properties with 3+ bedrooms and 2+ bathrooms',
-                'table': table_name
-            }
-        ])
-    
-    return suggestions
+    return _fill_suggestion_templates(_RETS_SUGGESTION_TEMPLATES, fields, 'table', table_name, suggestions)
 
 def get_smart_suggestions(metadata, protocol="RETS", user_context=None):
     """
@@ -753,86 +907,97 @@ def _add_contextual_suggestions(suggestions, user_context, protocol):
     
     return suggestions
 
+# Common query patterns that work across most systems. They are built once and copied
+# into each call's suggestions; only the date-dependent "Recent Listings" entry is built per call.
+_RESO_COMMON_BASIC_QUERIES = (
+    {
+        'name': 'All Active Listings',
+        'query': "StandardStatus eq 'Active'",
+        'description': 'Basic query to get all active listings',
+        'context': 'Common pattern'
+    },
+)
+
+_RESO_COMMON_ADVANCED_QUERIES = (
+    {
+        'name': 'Luxury Properties ($1M+)',
+        'query': "ListPrice ge 1000000 and StandardStatus eq 'Active'",
+        'description': 'High-end properties over $1 million',
+        'context': 'Common pattern'
+    },
+    {
+        'name': 'New Construction',
+        'query': "PropertyType eq 'New Construction' or PropertyType eq 'New'",
+        'description': 'New construction properties',
+        'context': 'Common pattern'
+    },
+)
+
+_RETS_COMMON_BASIC_QUERIES = (
+    {
+        'name': 'All Active Listings',
+        'query': "(Status=Active)",
+        'description': 'Basic query to get all active listings',
+        'context': 'Common pattern'
+    },
+)
+
+_RETS_COMMON_ADVANCED_QUERIES = (
+    {
+        'name': 'Luxury Properties ($1M+)',
+        'query': "(Status=Active),(ListPrice=1000000+)",
+        'description': 'High-end properties over $1 million',
+        'context': 'Common pattern'
+    },
+    {
+        'name': 'New Construction',
+        'query': "(PropertyType=New Construction)",
+        'description': 'New construction properties',
+        'context': 'Common pattern'
+    },
+)
+
 def _add_common_patterns(suggestions, protocol):
     """Add common query patterns that work across most systems."""
+    today = datetime.now().strftime('%Y-%m-%d')
     
     if protocol == "RESO Web API":
-        suggestions['basic_queries'].extend([
-            {
-                'name': 'All Active Listings',
-                'query': "StandardStatus eq 'Active'",
-                'description': 'Basic query to get all active listings',
-                'context': 'Common pattern'
-            },
-            {
-                'name': 'Recent Listings (Last 30 Days)',
-                'query': f"ModificationTimestamp ge {datetime.now().strftime('%Y-%m-%d')}",
-                'description': 'Listings modified in the last 30 days',
-                'context': 'Common pattern'
-            }
-        ])
-        
-        suggestions['advanced_queries'].extend([
-            {
-                'name': 'Luxury Properties ($1M+)',
-                'query': "ListPrice ge 1000000 and StandardStatus eq 'Active'",
-                'description': 'High-end properties over $1 million',
-                'context': 'Common pattern'
-            },
-            {
-                'name': 'New Construction',
-                'query': "PropertyType eq 'New Construction' or PropertyType eq 'New'",
-                'description': 'New construction properties',
-                'context': 'Common pattern'
-            }
-        ])
-    
+        basic_queries = _RESO_COMMON_BASIC_QUERIES
+        recent_query = f"ModificationTimestamp ge {today}"
+        advanced_queries = _RESO_COMMON_ADVANCED_QUERIES
     else:  # RETS
-        suggestions['basic_queries'].extend([
-            {
-                'name': 'All Active Listings',
-                'query': "(Status=Active)",
-                'description': 'Basic query to get all active listings',
-                'context': 'Common pattern'
-            },
-            {
-                'name': 'Recent Listings (Last 30 Days)',
-                'query': f"(ModificationTimestamp={datetime.now().strftime('%Y-%m-%d')}+)",
-                'description': 'Listings modified in the last 30 days',
-                'context': 'Common pattern'
-            }
-        ])
-        
-        suggestions['advanced_queries'].extend([
-            {
-                'name': 'Luxury Properties ($1M+)',
-                'query': "(Status=Active),(ListPrice=1000000+)",
-                'description': 'High-end properties over $1 million',
-                'context': 'Common pattern'
-            },
-            {
-                'name': 'New Construction',
-                'query': "(PropertyType=New Construction)",
-                'description': 'New construction properties',
-                'context': 'Common pattern'
-            }
-        ])
+        basic_queries = _RETS_COMMON_BASIC_QUERIES
+        recent_query = f"(ModificationTimestamp={today}+)"
+        advanced_queries = _RETS_COMMON_ADVANCED_QUERIES
+    
+    suggestions['basic_queries'].extend(map(dict, basic_queries))
+    suggestions['basic_queries'].append({
+        'name': 'Recent Listings (Last 30 Days)',
+        'query': recent_query,
+        'description': 'Listings modified in the last 30 days',
+        'context': 'Common pattern'
+    })
+    suggestions['advanced_queries'].extend(map(dict, advanced_queries))
     
     return suggestions
 
+# Price bounds in recent queries, e.g. "ListPrice ge 200000" and "(ListPrice=200000-400000)"
+_RESO_PRICE_RE = re.compile(r'ListPrice\s+(ge|gt)\s+(\d+)')
+_RETS_PRICE_RE = re.compile(r'ListPrice=(\d+)-(\d+)')
+
 def _generate_similar_price_query(price_query, protocol):
     """Generate a similar price query based on an existing one."""
     # Extract price range from existing query
     if protocol == "RESO Web API":
         # Look for price patterns like "ListPrice ge 200000 and ListPrice le 400000"
-        price_match = re.search(r'ListPrice\s+(ge|gt)\s+(\d+)', price_query)
+        price_match = _RESO_PRICE_RE.search(price_query)
         if price_match:
             min_price = int(price_match.group(2))
             max_price = min_price * 2  # Double the range
             return f"ListPrice ge {min_price} and ListPrice le {max_price}"
     else:
         # Look for price patterns like "(ListPrice=200000-400000)"
-        price_match = re.search(r'ListPrice=(\d+)-(\d+)', price_query)
+        price_match = _RETS_PRICE_RE.search(price_query)
         if price_match:
             min_price = int(price_match.group(1))
             max_price = int(price_match.group(2))
@@ -843,6 +1008,68 @@ def _generate_similar_price_query(price_query, protocol):
     # Fallback to a generic price query
     return "ListPrice ge 200000 and ListPrice le 500000" if protocol == "RESO Web API" else "(ListPrice=200000-500000)"
 
+# Boost patterns for field relevance: (search pattern, field-name keyword regex)
+_RELEVANCE_BOOST_PATTERNS = (
+    ('price', r'price|value'),
+    ('status', r'status'),
+    ('location', r'city|state|zip|county|address'),
+    ('property', r'type|category'),
+    ('date', r'date|timestamp|modified|created'),
+    ('bedroom', r'bed'),
+    ('bathroom', r'bath'),
+)
+
+def _field_index(metadata, protocol):
+    """
+    Build the DataFrame of fields searched by get_field_recommendations.
+    
+    Columns are the original field_name, source, type and description, their
+    lowercased name_lower, type_lower and desc_lower copies, and one boolean
+    boost_<pattern> column per _RELEVANCE_BOOST_PATTERNS entry, since boosts
+    depend only on the field name.
+    
+    The index is memoized per metadata object and protocol, so each keystroke in a
+    field search does not re-walk or re-lowercase the metadata.
+    """
+    return session_memo('field_index', metadata, lambda: _build_field_index(metadata, protocol), (protocol,))
+
+def _build_field_index(metadata, protocol):
+    """Build the _field_index DataFrame for metadata."""
+    records = []
+    if protocol == "RESO Web API":
+        for resource_name, resource_data in metadata.items():
+            if isinstance(resource_data, dict):
+                for prop in resource_data.get('properties', []):
+                    if isinstance(prop, dict):
+                        field_name = prop.get('name', '')
+                        field_type = prop.get('type', '')
+                        description = prop.get('description', '')
+                        records.append((
+                            field_name, resource_name, field_type, description,
+                            field_name.lower(), field_type.lower(), description.lower()
+                        ))
+    
+    else:  # RETS
+        for table_name, table_fields in _rets_tables(metadata):
+            for field in table_fields:
+                if isinstance(field, dict):
+                    field_name = field.get('SystemName', field.get('StandardName', ''))
+                    data_type = field.get('DataType', '')
+                    long_name = field.get('LongName', '')
+                    records.append((
+                        field_name, table_name, data_type, long_name,
+                        field_name.lower(), data_type.lower(), long_name.lower()
+                    ))
+    
+    index = pd.DataFrame(records, columns=[
+        'field_name', 'source', 'type', 'description', 'name_lower', 'type_lower', 'desc_lower'
+    ])
+    if not index.empty:
+        for pattern, keyword_regex in _RELEVANCE_BOOST_PATTERNS:
+            index[f'boost_{pattern}'] = index['name_lower'].str.contains(keyword_regex, regex=True).to_numpy(dtype=bool)
+    
+    return index
+
 def get_field_recommendations(metadata, protocol="RETS", search_term=""):
     """
     Get field recommendations based on search term and metadata analysis.
@@ -855,110 +1082,81 @@ def get_field_recommendations(metadata, protocol="RETS", search_term=""):
     Returns:
         list: Recommended fields with relevance scores
     """
-    recommendations = []
+    # Nothing scores without a search term, so skip building and walking the field index
+    if not search_term.strip():
+        return []
     
-    if protocol == "RESO Web API":
-        for resource_name, resource_data in metadata.items():
-            if isinstance(resource_data, dict):
-                properties = resource_data.get('properties', [])
-                
-                for prop in properties:
-                    if isinstance(prop, dict):
-                        field_name = prop.get('name', '')
-                        field_type = prop.get('type', '')
-                        description = prop.get('description', '')
-                        
-                        # Calculate relevance score
-                        relevance = _calculate_field_relevance(field_name, field_type, description, search_term)
-                        
-                        if relevance > 0:
-                            recommendations.append({
-                                'field_name': field_name,
-                                'resource': resource_name,
-                                'type': field_type,
-                                'description': description,
-                                'relevance': relevance
-                            })
+    index = _field_index(metadata, protocol)
+    if index.empty:
+        return []
     
-    else:  # RETS
-        for metadata_type, metadata_content in metadata.items():
-            if metadata_type.startswith('TABLE_') and metadata_content:
-                if isinstance(metadata_content, dict) and 'fields' in metadata_content:
-                    for field in metadata_content['fields']:
-                        if isinstance(field, dict):
-                            field_name = field.get('SystemName', field.get('StandardName', ''))
-                            data_type = field.get('DataType', '')
-                            long_name = field.get('LongName', '')
-                            
-                            # Calculate relevance score
-                            relevance = _calculate_field_relevance(field_name, data_type, long_name, search_term)
-                            
-                            if relevance > 0:
-                                recommendations.append({
-                                    'field_name': field_name,
-                                    'table': metadata_type.replace('TABLE_', ''),
-                                    'type': data_type,
-                                    'description': long_name,
-                                    'relevance': relevance
-                                })
-    
-    # Sort by relevance and return top recommendations
-    recommendations.sort(key=lambda x: x['relevance'], reverse=True)
-    return recommendations[:10]  # Return top 10
+    relevance = _field_relevance_scores(index, search_term.lower())
+    
+    # Sort by relevance and return top recommendations; the stable sort keeps
+    # metadata order among equal scores
+    top = [i for i in np.argsort(-relevance, kind='stable')[:10] if relevance[i] > 0]
+    
+    # RESO fields are reported per resource, RETS fields per table
+    source_key = 'resource' if protocol == "RESO Web API" else 'table'
+    
+    return [
+        {
+            'field_name': index['field_name'].iat[i],
+            source_key: index['source'].iat[i],
+            'type': index['type'].iat[i],
+            'description': index['description'].iat[i],
+            'relevance': int(relevance[i])
+        }
+        for i in top
+    ]
 
-def _calculate_field_relevance(field_name, field_type, description, search_term):
-    """Calculate relevance score for a field based on search term."""
-    if not search_term:
-        return 0
+def _field_relevance_scores(index, search_lower):
+    """
+    Calculate relevance scores for every field in a _field_index frame at once.
+    
+    Each rule is a vectorized string comparison over a whole column, so the scoring
+    runs in pandas/numpy rather than a Python call per field.
     
-    search_lower = search_term.lower()
-    field_lower = field_name.lower()
-    type_lower = field_type.lower()
-    desc_lower = description.lower()
+    Args:
+        index: Field index from _field_index
+        search_lower: Lowercased, non-blank search term
     
-    relevance = 0
+    Returns:
+        numpy array of relevance scores, aligned with the index rows
+    """
+    names = index['name_lower']
     
-    # Exact match gets highest score
-    if search_lower == field_lower:
-        relevance += 100
-    elif search_lower in field_lower:
-        relevance += 50
-    elif field_lower in search_lower:
-        relevance += 30
+    # Exact match gets highest score, then the search inside the name, then the name inside the search
+    exact = (names == search_lower).to_numpy(dtype=bool)
+    contains = names.str.contains(search_lower, regex=False).to_numpy(dtype=bool)
+    contained = np.fromiter((name in search_lower for name in names), dtype=bool, count=len(names))
+    relevance = np.select([exact, contains, contained], [100, 50, 30], default=0)
     
     # Partial matches
-    if any(word in field_lower for word in search_lower.split()):
-        relevance += 20
+    partial = np.zeros(len(names), dtype=bool)
+    for word in search_lower.split():
+        partial |= names.str.contains(word, regex=False).to_numpy(dtype=bool)
+    relevance += 20 * partial
     
     # Type matching
-    if search_lower in type_lower:
-        relevance += 15
+    relevance += 15 * index['type_lower'].str.contains(search_lower, regex=False).to_numpy(dtype=bool)
     
     # Description matching
-    if search_lower in desc_lower:
-        relevance += 10
+    relevance += 10 * index['desc_lower'].str.contains(search_lower, regex=False).to_numpy(dtype=bool)
     
     # Boost common field types
-    common_patterns = {
-        'price': ['price', 'listprice', 'saleprice', 'value'],
-        'status': ['status', 'listingstatus'],
-        'location': ['city', 'state', 'zip', 'county', 'address'],
-        'property': ['propertytype', 'type', 'category'],
-        'date': ['date', 'timestamp', 'modified', 'created'],
-        'bedroom': ['bedroom', 'beds', 'bed'],
-        'bathroom': ['bathroom', 'baths', 'bath']
-    }
-    
-    for pattern, keywords in common_patterns.items():
+    for pattern, _ in _RELEVANCE_BOOST_PATTERNS:
         if pattern in search_lower:
-            if any(keyword in field_lower for keyword in keywords):
-                relevance += 25
+            relevance += 25 * index[f'boost_{pattern}'].to_numpy()
     
     return relevance
 
 class CacheEntry:
     """A cache entry with TTL (Time To Live) support."""
     
+    # No per-instance __dict__; a full cache holds up to max_size entries
+    __slots__ = ('data', 'created_at', 'ttl_seconds', 'expires_at')
+    
     def __init__(self, data: Any, ttl_seconds: int = 3600):
         """
         Initialize a cache entry.
@@ -968,20 +1166,28 @@ class CacheEntry:
             ttl_seconds: Time to live in seconds (default: 1 hour)
         """
         self.data = data
-        self.created_at = time.time()
+        # Monotonic clock readings, so wall-clock adjustments cannot expire or revive entries
+        self.created_at = time.monotonic()
         self.ttl_seconds = ttl_seconds
+        self.expires_at = self.created_at + ttl_seconds
     
-    def is_expired(self) -> bool:
-        """Check if the cache entry has expired."""
-        return time.time() - self.created_at > self.ttl_seconds
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        """Check if the cache entry has expired, optionally against a time.monotonic() reading."""
+        if now is None:
+            now = time.monotonic()
+        return now > self.expires_at
     
-    def get_age_seconds(self) -> float:
+    def get_age_seconds(self, now: Optional[float] = None) -> float:
         """Get the age of the cache entry in seconds."""
-        return time.time() - self.created_at
+        if now is None:
+            now = time.monotonic()
+        return now - self.created_at
     
-    def get_remaining_ttl_seconds(self) -> float:
+    def get_remaining_ttl_seconds(self, now: Optional[float] = None) -> float:
         """Get the remaining TTL in seconds."""
-        return max(0, self.ttl_seconds - self.get_age_seconds())
+        if now is None:
+            now = time.monotonic()
+        return max(0, self.expires_at - now)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert cache entry to dictionary for serialization."""
@@ -996,6 +1202,7 @@ class CacheEntry:
         """Create cache entry from dictionary."""
         entry = cls(data['data'], data['ttl_seconds'])
         entry.created_at = data['created_at']
+        entry.expires_at = entry.created_at + entry.ttl_seconds
         return entry
 
 class TTLCache:
@@ -1009,10 +1216,18 @@ class TTLCache:
             default_ttl_seconds: Default TTL in seconds (default: 1 hour)
             max_size: Maximum number of cache entries (default: 1000)
         """
-        self.cache: Dict[str, CacheEntry] = {}
+        # Entries are kept in LRU order, least recently used first
+        self.cache: OrderedDict[str, CacheEntry] = OrderedDict()
         self.default_ttl_seconds = default_ttl_seconds
         self.max_size = max_size
-        self.access_times: Dict[str, float] = {}  # For LRU eviction
+        # Min-heap of (expires_at, sequence, key) for clear_expired. Records of entries that were
+        # replaced or removed stay in the heap and are skipped when popped; the heap never
+        # references the entries, so removed data is freed immediately.
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._expiry_sequence = count()
+        # Reverse index of group -> keys for clear_group, and key -> group to keep it in sync
+        self._groups: Dict[str, set] = {}
+        self._key_groups: Dict[str, str] = {}
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -1027,9 +1242,9 @@ class TTLCache:
         """
         if key in self.cache:
             entry = self.cache[key]
-            if not entry.is_expired():
-                # Update access time for LRU
-                self.access_times[key] = time.time()
+            if not entry.is_expired(time.monotonic()):
+                # Mark as most recently used
+                self.cache.move_to_end(key)
                 return entry.data
             else:
                 # Remove expired entry
@@ -1037,7 +1252,34 @@ class TTLCache:
         
         return default
     
-    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+    def get_or_set(self, key: str, factory, ttl_seconds: Optional[int] = None, group: Optional[str] = None) -> Any:
+        """
+        Get a value from cache, or create, store and return it if missing or expired.
+        
+        Args:
+            key: Cache key
+            factory: Function called without arguments to create the value on a miss
+            ttl_seconds: TTL in seconds for a newly created value (uses default if None)
+            group: Optional group for a newly created value, see clear_group
+            
+        Returns:
+            Cached or newly created value; a None result is returned but not cached
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            if not entry.is_expired(time.monotonic()):
+                # Mark as most recently used
+                self.cache.move_to_end(key)
+                return entry.data
+            # Remove expired entry
+            self._remove_entry(key)
+        
+        value = factory()
+        if value is not None:
+            self.set(key, value, ttl_seconds, group)
+        return value
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None, group: Optional[str] = None) -> None:
         """
         Set a value in cache.
         
@@ -1045,16 +1287,32 @@ class TTLCache:
             key: Cache key
             value: Value to cache
             ttl_seconds: TTL in seconds (uses default if None)
+            group: Optional group the key belongs to, see clear_group
         """
         if ttl_seconds is None:
             ttl_seconds = self.default_ttl_seconds
         
-        # Check if we need to evict entries
-        if len(self.cache) >= self.max_size:
+        if key in self.cache:
+            # Drop the old entry so the new one is inserted as most recently used
+            self._remove_entry(key)
+        elif len(self.cache) >= self.max_size:
+            # Check if we need to evict entries
             self._evict_lru()
         
-        self.cache[key] = CacheEntry(value, ttl_seconds)
-        self.access_times[key] = time.time()
+        entry = CacheEntry(value, ttl_seconds)
+        self.cache[key] = entry
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+            self._key_groups[key] = group
+        heapq.heappush(self._expiry_heap, (entry.expires_at, next(self._expiry_sequence), key))
+        
+        # Rebuild the heap once stale records outnumber live entries
+        if len(self._expiry_heap) > 2 * len(self.cache) + 16:
+            self._expiry_heap = [
+                (entry.expires_at, next(self._expiry_sequence), key)
+                for key, entry in self.cache.items()
+            ]
+            heapq.heapify(self._expiry_heap)
     
     def delete(self, key: str) -> bool:
         """
@@ -1071,7 +1329,26 @@ class TTLCache:
     def clear(self) -> None:
         """Clear all cache entries."""
         self.cache.clear()
-        self.access_times.clear()
+        self._expiry_heap.clear()
+        self._groups.clear()
+        self._key_groups.clear()
+    
+    def clear_group(self, group: str) -> int:
+        """
+        Clear all entries stored with a group.
+        
+        Args:
+            group: Group to clear
+            
+        Returns:
+            Number of entries cleared
+        """
+        keys = self._groups.pop(group, ())
+        for key in keys:
+            del self._key_groups[key]
+            del self.cache[key]
+        
+        return len(keys)
     
     def clear_expired(self) -> int:
         """
@@ -1080,15 +1357,20 @@ class TTLCache:
         Returns:
             Number of entries cleared
         """
-        expired_keys = [
-            key for key, entry in self.cache.items()
-            if entry.is_expired()
-        ]
+        now = time.monotonic()
+        heap = self._expiry_heap
+        cleared = 0
         
-        for key in expired_keys:
-            self._remove_entry(key)
+        # Pop deadlines in order until the earliest one is still in the future
+        while heap and heap[0][0] < now:
+            expires_at, _, key = heapq.heappop(heap)
+            # A record is stale if its key was removed or set again with a new deadline
+            entry = self.cache.get(key)
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove_entry(key)
+                cleared += 1
         
-        return len(expired_keys)
+        return cleared
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -1098,12 +1380,18 @@ class TTLCache:
             Dictionary with cache statistics
         """
         total_entries = len(self.cache)
-        expired_entries = sum(1 for entry in self.cache.values() if entry.is_expired())
-        valid_entries = total_entries - expired_entries
         
-        # Calculate average age and TTL
-        ages = [entry.get_age_seconds() for entry in self.cache.values()]
-        ttls = [entry.ttl_seconds for entry in self.cache.values()]
+        # Count expired entries and sum ages and TTLs in one pass against a single clock reading
+        now = time.monotonic()
+        expired_entries = 0
+        age_sum = 0.0
+        ttl_sum = 0
+        for entry in self.cache.values():
+            if now > entry.expires_at:
+                expired_entries += 1
+            age_sum += now - entry.created_at
+            ttl_sum += entry.ttl_seconds
+        valid_entries = total_entries - expired_entries
         
         return {
             'total_entries': total_entries,
@@ -1112,27 +1400,27 @@ class TTLCache:
             'cache_size': len(self.cache),
             'max_size': self.max_size,
             'utilization_percent': (len(self.cache) / self.max_size) * 100 if self.max_size > 0 else 0,
-            'avg_age_seconds': sum(ages) / len(ages) if ages else 0,
-            'avg_ttl_seconds': sum(ttls) / len(ttls) if ttls else 0
+            'avg_age_seconds': age_sum / total_entries if total_entries else 0,
+            'avg_ttl_seconds': ttl_sum / total_entries if total_entries else 0
         }
     
     def _remove_entry(self, key: str) -> bool:
         """Remove an entry from cache."""
-        if key in self.cache:
-            del self.cache[key]
-            if key in self.access_times:
-                del self.access_times[key]
-            return True
-        return False
+        if self.cache.pop(key, None) is None:
+            return False
+        
+        group = self._key_groups.pop(key, None)
+        if group is not None:
+            group_keys = self._groups[group]
+            group_keys.discard(key)
+            if not group_keys:
+                del self._groups[group]
+        return True
     
     def _evict_lru(self) -> None:
         """Evict least recently used entry."""
-        if not self.access_times:
-            return
-        
-        # Find LRU key
-        lru_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-        self._remove_entry(lru_key)
+        if self.cache:
+            self._remove_entry(next(iter(self.cache)))
 
 # Cache configuration constants
 CACHE_TTL_CONFIG = {
@@ -1173,26 +1461,16 @@ def get_cached_data(cache_type: str, key: str, fetch_func, ttl_seconds: Optional
     cache = st.session_state.ttl_cache
     cache_key = f"{cache_type}:{key}"
     
-    # Try to get from cache
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return cached_data
+    # Use configured TTL or provided TTL
+    if ttl_seconds is None:
+        ttl_seconds = CACHE_TTL_CONFIG.get(cache_type, 3600)
     
-    # Fetch fresh data
+    # Return the cached data, or fetch and cache fresh data in the same lookup
     try:
-        fresh_data = fetch_func()
-        if fresh_data is not None:
-            # Use configured TTL or provided TTL
-            if ttl_seconds is None:
-                ttl_seconds = CACHE_TTL_CONFIG.get(cache_type, 3600)
-            
-            cache.set(cache_key, fresh_data, ttl_seconds)
-            return fresh_data
+        return cache.get_or_set(cache_key, fetch_func, ttl_seconds, group=cache_type)
     except Exception as e:
         st.error(f"Error fetching {cache_type} data: {str(e)}")
         return None
-    
-    return None
 
 def clear_cache_by_type(cache_type: str) -> int:
     """
@@ -1204,19 +1482,16 @@ def clear_cache_by_type(cache_type: str) -> int:
     Returns:
         Number of entries cleared
     """
+    # The field search index and table list are derived from the metadata, drop them along with it
+    if cache_type == 'metadata':
+        st.session_state.pop('field_index', None)
+        st.session_state.pop('rets_tables', None)
+    
     if 'ttl_cache' not in st.session_state:
         return 0
     
-    cache = st.session_state.ttl_cache
-    keys_to_remove = [
-        key for key in cache.cache.keys()
-        if key.startswith(f"{cache_type}:")
-    ]
-    
-    for key in keys_to_remove:
-        cache.delete(key)
-    
-    return len(keys_to_remove)
+    # get_cached_data stores every entry under its cache type as the group
+    return st.session_state.ttl_cache.clear_group(cache_type)
 
 def get_cache_stats() -> Dict[str, Any]:
     """
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-import io
+import numpy as np
+import warnings
 from datetime import datetime
+from utils import get_results_df, dataframe_to_csv_bytes, session_memo, estimate_memory_usage
 
 def render_data_visualization():
     """Render comprehensive data visualization for query results."""
@@ -9,7 +11,7 @@ def render_data_visualization():
         st.info("No query results available for visualization. Please execute a query first.")
         return
     
-    results_df = pd.DataFrame(st.session_state.query_results)
+    results_df = get_results_df()
     
     # Show results summary
     col1, col2, col3 = st.columns(3)
@@ -18,7 +20,7 @@ def render_data_visualization():
     with col2:
         st.metric("Total Columns", len(results_df.columns))
     with col3:
-        st.metric("Data Size", f"{results_df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+        st.metric("Data Size", f"{estimate_memory_usage(results_df) / 1024:.1f} KB")
     
     # Data table with toggle
     st.subheader("📊 Data Table")
@@ -30,40 +32,104 @@ def render_data_visualization():
     if show_visuals:
         render_charts_and_analytics(results_df)
 
+# Column-name keywords for each chart, matched as lowercase substrings
+_NUMERIC_CHART_KEYWORDS = {
+    'price': ('price', 'list'),
+    'bedroom': ('bed',),
+    'bathroom': ('bath',),
+    'lat': ('lat',),
+    'lon': ('lon',),
+}
+_CATEGORICAL_CHART_KEYWORDS = {
+    'property': ('type', 'property'),
+}
+
+def _classify_chart_columns(df):
+    """Sort the columns of df into chart buckets in one pass, lowercasing each name once."""
+    numeric_cols = set(df.select_dtypes(include=['number']).columns)
+    categorical_cols = set(df.select_dtypes(include=['object', 'string', 'category']).columns)
+    
+    chart_cols = {kind: [] for kind in (*_NUMERIC_CHART_KEYWORDS, *_CATEGORICAL_CHART_KEYWORDS)}
+    for col in df.columns:
+        if col in numeric_cols:
+            keyword_table = _NUMERIC_CHART_KEYWORDS
+        elif col in categorical_cols:
+            keyword_table = _CATEGORICAL_CHART_KEYWORDS
+        else:
+            continue
+        
+        col_lower = col.lower()
+        for kind, keywords in keyword_table.items():
+            if any(keyword in col_lower for keyword in keywords):
+                chart_cols[kind].append(col)
+    
+    return chart_cols
+
+# Leading non-null values parsed to rule a text column out before parsing all of it
+_DATE_SAMPLE_SIZE = 100
+
+def _to_datetime(values):
+    """Coerce values to datetimes, returning None if pandas rejects them outright."""
+    try:
+        with warnings.catch_warnings():
+            # Columns that are not dates make pandas warn that it cannot infer a format
+            warnings.simplefilter('ignore', UserWarning)
+            return pd.to_datetime(values, errors='coerce')
+    except (ValueError, TypeError):
+        return None
+
+def _parse_date_columns(df):
+    """
+    Return {column: parsed datetimes} for the text columns of df that hold dates.
+    
+    A column counts as a date column when over 80% of its non-null values parse.
+    Its first _DATE_SAMPLE_SIZE non-null values are checked first, so free text and
+    ID columns are rejected without parsing the whole column.
+    """
+    parsed_dates = {}
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        sample = df[col].dropna().head(_DATE_SAMPLE_SIZE)
+        if sample.empty:
+            continue
+        parsed = _to_datetime(sample)
+        if parsed is None or parsed.count() <= 0.8 * len(sample):
+            continue
+        
+        parsed = _to_datetime(df[col])
+        if parsed is not None and parsed.count() > 0.8 * df[col].count():
+            parsed_dates[col] = parsed
+    return parsed_dates
+
 def render_charts_and_analytics(df):
     """Render various charts and analytics for the data."""
     st.subheader("📈 Data Visualizations")
     
-    # Get numeric and categorical columns
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    # Get the candidate columns for every chart
+    chart_cols = _classify_chart_columns(df)
     
     # Price distribution (if price-related columns exist)
-    price_cols = [col for col in numeric_cols if 'price' in col.lower() or 'list' in col.lower()]
+    price_cols = chart_cols['price']
     if price_cols:
         st.write("**💰 Price Distribution**")
         price_col = st.selectbox("Select Price Column:", price_cols, key="price_chart")
         
         if price_col and df[price_col].notna().sum() > 0:
             # Create price ranges manually to avoid pandas Interval issues
-            price_data = df[price_col].dropna()
+            price_data = df[price_col].dropna().to_numpy(dtype='float64')
             if len(price_data) > 0:
                 min_price = price_data.min()
                 max_price = price_data.max()
                 
                 # Create custom bins
                 if max_price > min_price:
-                    bin_edges = pd.linspace(min_price, max_price, 11)
+                    # Ten equal-width bins counted in one pass
+                    hist_counts, bin_edges = np.histogram(price_data, bins=10)
                     bin_labels = [f"${int(bin_edges[i]):,}-${int(bin_edges[i+1]):,}" for i in range(len(bin_edges)-1)]
                     
-                    # Create histogram data
-                    hist_data = pd.cut(price_data, bins=bin_edges, labels=bin_labels, include_lowest=True)
-                    hist_counts = hist_data.value_counts().sort_index()
-                    
                     # Create chart data
                     chart_data = pd.DataFrame({
-                        'Price Range': hist_counts.index.astype(str),
-                        'Count': hist_counts.values
+                        'Price Range': bin_labels,
+                        'Count': hist_counts
                     })
                     
                     st.bar_chart(chart_data.set_index('Price Range'))
@@ -71,7 +137,7 @@ def render_charts_and_analytics(df):
                     st.info("Not enough price variation for histogram")
     
     # Property type distribution (if property type columns exist)
-    property_cols = [col for col in categorical_cols if 'type' in col.lower() or 'property' in col.lower()]
+    property_cols = chart_cols['property']
     if property_cols:
         st.write("**🏠 Property Type Distribution**")
         property_col = st.selectbox("Select Property Type Column:", property_cols, key="property_chart")
@@ -88,8 +154,8 @@ def render_charts_and_analytics(df):
                 st.bar_chart(chart_data.set_index('Property Type'))
     
     # Bedrooms and bathrooms (if they exist)
-    bedroom_cols = [col for col in numeric_cols if 'bedroom' in col.lower() or 'bed' in col.lower()]
-    bathroom_cols = [col for col in numeric_cols if 'bathroom' in col.lower() or 'bath' in col.lower()]
+    bedroom_cols = chart_cols['bedroom']
+    bathroom_cols = chart_cols['bathroom']
     
     if bedroom_cols or bathroom_cols:
         col1, col2 = st.columns(2)
@@ -100,10 +166,11 @@ def render_charts_and_analytics(df):
                 bedroom_col = st.selectbox("Select Bedroom Column:", bedroom_cols, key="bedroom_chart")
                 
                 if bedroom_col and df[bedroom_col].notna().sum() > 0:
-                    bedroom_counts = df[bedroom_col].value_counts().sort_index()
+                    # Sorted distinct values and their counts in one pass
+                    bedroom_values, bedroom_counts = np.unique(df[bedroom_col].dropna().to_numpy(), return_counts=True)
                     chart_data = pd.DataFrame({
-                        'Bedrooms': bedroom_counts.index,
-                        'Count': bedroom_counts.values
+                        'Bedrooms': bedroom_values,
+                        'Count': bedroom_counts
                     })
                     st.bar_chart(chart_data.set_index('Bedrooms'))
         
@@ -113,16 +180,16 @@ def render_charts_and_analytics(df):
                 bathroom_col = st.selectbox("Select Bathroom Column:", bathroom_cols, key="bathroom_chart")
                 
                 if bathroom_col and df[bathroom_col].notna().sum() > 0:
-                    bathroom_counts = df[bathroom_col].value_counts().sort_index()
+                    bathroom_values, bathroom_counts = np.unique(df[bathroom_col].dropna().to_numpy(), return_counts=True)
                     chart_data = pd.DataFrame({
-                        'Bathrooms': bathroom_counts.index,
-                        'Count': bathroom_counts.values
+                        'Bathrooms': bathroom_values,
+                        'Count': bathroom_counts
                     })
                     st.bar_chart(chart_data.set_index('Bathrooms'))
     
     # Geographic visualization (if coordinates exist)
-    lat_cols = [col for col in numeric_cols if 'lat' in col.lower() or 'latitude' in col.lower()]
-    lon_cols = [col for col in numeric_cols if 'lon' in col.lower() or 'longitude' in col.lower()]
+    lat_cols = chart_cols['lat']
+    lon_cols = chart_cols['lon']
     
     if lat_cols and lon_cols:
         st.write("**📍 Geographic Distribution**")
@@ -130,15 +197,16 @@ def render_charts_and_analytics(df):
         lon_col = st.selectbox("Select Longitude Column:", lon_cols, key="lon_chart")
         
         if lat_col and lon_col:
-            # Filter out invalid coordinates
-            valid_coords = df[(df[lat_col].notna()) & (df[lon_col].notna()) & 
-                            (df[lat_col] != 0) & (df[lon_col] != 0)]
+            # Filter out invalid coordinates on the two columns only, without copying whole rows
+            lat = df[lat_col].to_numpy(dtype='float64', na_value=np.nan)
+            lon = df[lon_col].to_numpy(dtype='float64', na_value=np.nan)
+            valid_coords = np.isfinite(lat) & np.isfinite(lon) & (lat != 0) & (lon != 0)
             
-            if len(valid_coords) > 0:
+            if valid_coords.any():
                 # Create scatter plot data
                 chart_data = pd.DataFrame({
-                    'Latitude': valid_coords[lat_col],
-                    'Longitude': valid_coords[lon_col]
+                    'Latitude': lat[valid_coords],
+                    'Longitude': lon[valid_coords]
                 })
                 
                 st.scatter_chart(chart_data, x='Longitude', y='Latitude')
@@ -146,13 +214,8 @@ def render_charts_and_analytics(df):
                 st.info("No valid coordinates found for mapping")
     
     # Time series analysis (if date columns exist)
-    date_cols = []
-    for col in df.columns:
-        try:
-            pd.to_datetime(df[col].head(10))
-            date_cols.append(col)
-        except:
-            continue
+    parsed_dates = session_memo('results_date_columns', df, lambda: _parse_date_columns(df))
+    date_cols = list(parsed_dates)
     
     if date_cols:
         st.write("**📅 Time Series Analysis**")
@@ -160,8 +223,7 @@ def render_charts_and_analytics(df):
         
         if date_col:
             try:
-                df[date_col] = pd.to_datetime(df[date_col])
-                date_counts = df[date_col].dt.date.value_counts().sort_index()
+                date_counts = parsed_dates[date_col].dt.date.value_counts().sort_index()
                 
                 if len(date_counts) > 0:
                     chart_data = pd.DataFrame({
@@ -181,7 +243,7 @@ def render_export_section():
     
     st.header("📁 Export Results")
     
-    results_df = pd.DataFrame(st.session_state.query_results)
+    results_df = get_results_df()
     
     # Export options
     col1, col2 = st.columns([2, 1])
@@ -219,18 +281,23 @@ def render_export_section():
         preview_df = results_df[selected_columns].head(10)
         st.dataframe(preview_df, use_container_width=True)
         
-        # Generate CSV
-        csv_buffer = io.StringIO()
-        results_df[selected_columns].to_csv(csv_buffer, index=include_index)
-        csv_data = csv_buffer.getvalue()
-        
-        # Download button
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv_data,
-            file_name=filename,
-            mime="text/csv",
-            use_container_width=True
+        # Generate CSV only on request, so other widget changes do not re-serialize the results;
+        # the prepared file stays available across reruns until the results or export options change
+        prepare = st.button("📦 Prepare Download", use_container_width=True)
+        csv_data = session_memo(
+            'prepared_export', results_df,
+            (lambda: dataframe_to_csv_bytes(results_df[selected_columns], index=include_index)) if prepare else None,
+            (tuple(selected_columns), include_index)
         )
+        
+        if csv_data is not None:
+            # Download button
+            st.download_button(
+                label="📥 Download CSV",
+                data=csv_data,
+                file_name=filename,
+                mime="text/csv",
+                use_container_width=True
+            )
     else:
         st.warning("Please select at least one column to export.") 
\ No newline at end of file